@@ -0,0 +1,13 @@
+# Packs the per-sample .pt files into memory-mappable shards (see lib/iq_shards.py)
+import time
+from lib.iq_shards import write_shards
+
+# CHANGE THESE PATHS IF NEEDED
+data_path = './data/drone_RF_data/'
+shard_path = './data/drone_RF_shards/'
+records_per_shard = 256  # 256 x 8 MB records -> 2 GB per shard
+
+since = time.time()
+index = write_shards(data_path, shard_path, records_per_shard=records_per_shard)
+time_elapsed = time.time() - since
+print('Conversion complete in {:.0f}m {:.0f}s'.format(time_elapsed // 60, time_elapsed % 60))
@@ -80,12 +80,18 @@ learning_rate = 0.005
 train_verbose = True  # show epoch
 model_name = 'vgg11_bn'
 num_folds = 5
+iq_window = None # reduced-resolution mode of the experiment (see train_model_cv5.py)
+freq_bins = None
 
 experiment_name = model_name + \
                 '_CV' + str(num_folds) + \
                 '_epochs' + str(num_epochs) + \
                 '_lr' + str(learning_rate) + \
                 '_batchsize' + str(batch_size)
+if iq_window is not None:
+    experiment_name += '_iq' + str(iq_window)
+if freq_bins is not None:
+    experiment_name += '_bins' + str(freq_bins[0]) + '-' + str(freq_bins[1])
 
 # create dataframe to store test evaluation results
 accuracy_df = pd.DataFrame(columns=['fold', 'accuracy train', 'accuracy test', 'weighted accuracy train', 'weighted accuracy test', 'best_epoch'])
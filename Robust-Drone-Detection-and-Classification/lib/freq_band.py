@@ -0,0 +1,19 @@
+# Python Module freq_band
+"""
+Sub-band crop of the two-sided STFT, shared by training (train_model_cv5.py,
+freq_bins) and the backend (CFG.freq_bins), so a model is always served the
+same rows it was trained on.
+"""
+import torch
+
+
+def band_index(n_fft, freq_bins, device=None):
+    """
+    Spectrogram rows of the sub-band freq_bins = (lo, hi), counted from the
+    lowest frequency (centre = n_fft // 2), in ascending frequency order.
+    The two-sided STFT keeps its bins in FFT order (DC first), hence the shift.
+    """
+    lo, hi = freq_bins
+    if not 0 <= lo < hi <= n_fft:
+        raise ValueError(f"freq_bins={freq_bins} outside 0..{n_fft}")
+    return (torch.arange(lo, hi, device=device) + n_fft // 2) % n_fft
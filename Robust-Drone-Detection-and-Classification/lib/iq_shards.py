@@ -0,0 +1,114 @@
+# Python Module iq_shards
+"""
+Fixed-stride binary shards for the IQ .pt dataset.
+
+A shard directory holds
+    index.json        record layout plus file name, target, snr and sample id of every record
+    shard_00000.bin   up to records_per_shard raw records, each x_iq as a (2, iq_len) float32 array
+    shard_00001.bin   ...
+
+Record i lives in shard i // records_per_shard at byte offset
+(i % records_per_shard) * record_bytes, so readers can memory-map the shards
+instead of unpickling one .pt file per sample.
+"""
+import json
+import os
+import numpy as np
+import torch
+
+INDEX_FILE = 'index.json'
+DTYPE = 'float32'
+
+
+def shard_file_name(shard_id):
+    return 'shard_%05d.bin' % shard_id
+
+
+def list_pt_files(path):
+    files = [f for f in os.listdir(path) if f.endswith('.pt') and f.startswith('IQdata_sample')]
+    files.sort()
+    return files
+
+
+def write_shards(src_path, out_path, records_per_shard=256, verbose=True):
+    """
+    Packs every IQdata_sample*.pt file of src_path into shards in out_path.
+    Returns the written index dict.
+    """
+    files = list_pt_files(src_path)
+    if not files:
+        raise FileNotFoundError(f"No IQdata_sample*.pt files found in {src_path}")
+    os.makedirs(out_path, exist_ok=True)
+
+    index = {'dtype': DTYPE, 'iq_len': None, 'records_per_shard': records_per_shard,
+             'num_records': 0, 'num_shards': 0, 'files': [], 'y': [], 'snr': [], 'sample_id': []}
+    out_file = None
+    for i, file in enumerate(files):
+        data_dict = torch.load(os.path.join(src_path, file), map_location='cpu')
+        x_iq = data_dict['x_iq'].to(torch.float32).numpy()
+        if index['iq_len'] is None:
+            index['iq_len'] = x_iq.shape[1]
+        if x_iq.shape != (2, index['iq_len']):
+            raise ValueError(f"{file}: x_iq shape {tuple(x_iq.shape)} does not match (2, {index['iq_len']})")
+
+        shard_id, record = divmod(i, records_per_shard)
+        if record == 0:
+            if out_file:
+                out_file.close()
+            out_file = open(os.path.join(out_path, shard_file_name(shard_id)), 'wb')
+            index['num_shards'] += 1
+        out_file.write(np.ascontiguousarray(x_iq).tobytes())
+
+        index['files'].append(file)
+        index['y'].append(int(data_dict['y']))
+        index['snr'].append(int(data_dict['snr']))
+        index['sample_id'].append(int(file.split('_')[1][6:]))
+        index['num_records'] += 1
+        if verbose and (i + 1) % 1000 == 0:
+            print(f"packed {i + 1}/{len(files)} samples")
+    out_file.close()
+
+    # write the index last, a directory without one is an unfinished conversion
+    tmp_index = os.path.join(out_path, INDEX_FILE + '.tmp')
+    with open(tmp_index, 'w') as f:
+        json.dump(index, f)
+    os.replace(tmp_index, os.path.join(out_path, INDEX_FILE))
+    if verbose:
+        print(f"wrote {index['num_records']} records in {index['num_shards']} shards to {out_path}")
+    return index
+
+
+class IQShardReader:
+    """
+    Random access to shard records through lazily opened memory maps.
+    read() returns a (2, iq_len) float32 view into the page cache; the maps
+    are copy-on-write, so the view is writable without touching the file.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, INDEX_FILE)) as f:
+            self.index = json.load(f)
+        self.iq_len = self.index['iq_len']
+        self.records_per_shard = self.index['records_per_shard']
+        self.maps = [None] * self.index['num_shards']
+
+    def __len__(self):
+        return self.index['num_records']
+
+    def _map(self, shard_id):
+        if self.maps[shard_id] is None:
+            num_records = min(self.records_per_shard, len(self) - shard_id * self.records_per_shard)
+            self.maps[shard_id] = np.memmap(os.path.join(self.path, shard_file_name(shard_id)),
+                                            dtype=self.index['dtype'], mode='c',
+                                            shape=(num_records, 2, self.iq_len))
+        return self.maps[shard_id]
+
+    def read(self, idx):
+        shard_id, record = divmod(idx, self.records_per_shard)
+        return self._map(shard_id)[record]
+
+    def __getstate__(self):
+        # memory maps are reopened per process (e.g. in DataLoader workers)
+        state = self.__dict__.copy()
+        state['maps'] = [None] * len(self.maps)
+        return state
@@ -1,9 +1,11 @@
 # Python Module model_VGG
 import torch
 import torch.nn as nn
+from torch.nn.utils.fusion import fuse_conv_bn_eval
 
 __all__ = [
-    'vgg11', 'vgg11_bn', 'vgg13', 'vgg13_bn', 'vgg16', 'vgg16_bn', 'vgg19_bn', 'vgg19',
+    'vgg11', 'vgg11_bn', 'vgg11_bn_slim', 'vgg13', 'vgg13_bn', 'vgg16', 'vgg16_bn', 'vgg19_bn', 'vgg19',
+    'fold_batchnorm',
 ]
 
 class VGG(nn.Module):
@@ -47,13 +49,14 @@ class VGG(nn.Module):
                 nn.init.constant_(m.bias, 0)
 
 
-def make_layers(cfg, batch_norm=False):
+def make_layers(cfg, batch_norm=False, width=1.0):
     layers = []
     in_channels = 2  
     for v in cfg:
         if v == 'M':
             layers += [nn.MaxPool2d(kernel_size=2, stride=2)] #2d
         else:
+            v = max(1, int(v * width))
             conv = nn.Conv2d(in_channels, v, kernel_size=3, padding=1) #2d
             if batch_norm:
                 layers += [conv, nn.BatchNorm2d(v), nn.ReLU(inplace=True)] #2d
@@ -63,6 +66,29 @@ def make_layers(cfg, batch_norm=False):
     return nn.Sequential(*layers)
 
 
+def fold_batchnorm(model):
+    r"""Inference-time transform for the *_bn models: folds every BatchNorm2d of
+    ``model.features`` into the preceding Conv2d using its running statistics,
+    leaving Conv->ReLU pairs (one pass less over each activation map).
+    Works for any configuration in ``cfgs``; models without BatchNorm are left as they are.
+    The model is switched to eval mode and modified in place; load the state dict first,
+    the layer indices of ``features`` change.
+    """
+    model.eval()
+    layers = list(model.features)
+    fused = []
+    i = 0
+    while i < len(layers):
+        layer = layers[i]
+        if isinstance(layer, nn.Conv2d) and i + 1 < len(layers) and isinstance(layers[i + 1], nn.BatchNorm2d):
+            layer = fuse_conv_bn_eval(layer, layers[i + 1])
+            i += 1
+        fused.append(layer)
+        i += 1
+    model.features = nn.Sequential(*fused)
+    return model
+
+
 cfgs = {
     'A': [64, 'M', 128, 'M', 256, 256, 'M', 512, 512, 'M', 512, 512, 'M'],
     'B': [64, 64, 'M', 128, 128, 'M', 256, 256, 'M', 512, 512, 'M', 512, 512, 'M'],
@@ -71,9 +97,10 @@ cfgs = {
 }
 
 
-def _vgg(arch, cfg, batch_norm, **kwargs):
+def _vgg(arch, cfg, batch_norm, width=1.0, **kwargs):
     #print("last N channels", cfgs[cfg][-2])
-    model = VGG(make_layers(cfgs[cfg], batch_norm=batch_norm), cfgs[cfg][-2], **kwargs)
+    model = VGG(make_layers(cfgs[cfg], batch_norm=batch_norm, width=width),
+                max(1, int(cfgs[cfg][-2] * width)), **kwargs)
     return model
 
 
@@ -97,6 +124,17 @@ def vgg11_bn(**kwargs):
     return _vgg('vgg11_bn', 'A', True, **kwargs)
 
 
+def vgg11_bn_slim(**kwargs):
+    r"""VGG 11-layer model (configuration "A") with batch normalization and a quarter
+    of the channels in every layer (~1/16 of the conv FLOPs of vgg11_bn).
+    Fast first tier of the backend's model cascade; train it like the other models.
+    Args:
+        width (float): channel multiplier, default 0.25
+    """
+    kwargs.setdefault('width', 0.25)
+    return _vgg('vgg11_bn_slim', 'A', True, **kwargs)
+
+
 def vgg13(**kwargs):
     r"""VGG 13-layer model (configuration "B")
     `"Very Deep Convolutional Networks For Large-Scale Image Recognition" <https://arxiv.org/pdf/1409.1556.pdf>`_
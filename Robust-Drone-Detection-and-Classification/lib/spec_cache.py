@@ -0,0 +1,86 @@
+# Python Module spec_cache
+"""
+On-disk cache of per-sample spectrograms for training.
+
+Entries live in a subdirectory named after a hash of the transform parameters
+and storage dtype, so changing n_fft / win_length / hop_length (or the dtype)
+never serves stale spectrograms. Inside it every sample is one .npy file
+keyed by source file name, size and modification time. When the cache grows
+beyond max_bytes the least recently used entries are evicted.
+"""
+import hashlib
+import json
+import os
+import numpy as np
+import torch
+
+
+class SpectrogramCache:
+    def __init__(self, path, transform_params, dtype='float16', max_bytes=None, rescan_every=256):
+        self.dtype = np.dtype(dtype)
+        self.max_bytes = max_bytes
+        self.rescan_every = rescan_every
+
+        params = dict(transform_params, dtype=self.dtype.name)
+        params_key = hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()[:16]
+        self.path = os.path.join(path, params_key)
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, 'params.json'), 'w') as f:
+            json.dump(params, f, sort_keys=True)
+
+        self.total_bytes = self._scan_bytes()
+        self.stores = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _entries(self):
+        return [e for e in os.scandir(self.path) if e.name.endswith('.npy')]
+
+    def _scan_bytes(self):
+        return sum(e.stat().st_size for e in self._entries())
+
+    def _entry_path(self, file_path):
+        st = os.stat(file_path)
+        key = f"{os.path.basename(file_path)}|{st.st_size}|{st.st_mtime_ns}"
+        return os.path.join(self.path, hashlib.sha1(key.encode()).hexdigest() + '.npy')
+
+    def load(self, file_path):
+        """Returns the cached spectrogram as a float32 tensor, or None on a miss."""
+        entry = self._entry_path(file_path)
+        try:
+            spec = np.load(entry)
+        except (FileNotFoundError, ValueError, EOFError):
+            self.misses += 1
+            return None
+        os.utime(entry) # mark as recently used for eviction
+        self.hits += 1
+        return torch.from_numpy(spec).float()
+
+    def store(self, file_path, spec):
+        entry = self._entry_path(file_path)
+        tmp_entry = entry[:-4] + f'.{os.getpid()}.tmp'
+        with open(tmp_entry, 'wb') as f:
+            np.save(f, spec.detach().cpu().numpy().astype(self.dtype))
+        os.replace(tmp_entry, entry) # atomic, other DataLoader workers never see partial files
+        self.total_bytes += os.path.getsize(entry)
+
+        self.stores += 1
+        if self.stores % self.rescan_every == 0:
+            self.total_bytes = self._scan_bytes() # pick up writes of other processes
+        if self.max_bytes is not None and self.total_bytes > self.max_bytes:
+            self._evict()
+
+    def _evict(self):
+        # drop least recently used entries until 90% of the budget is left
+        entries = sorted(self._entries(), key=lambda e: e.stat().st_mtime)
+        self.total_bytes = sum(e.stat().st_size for e in entries)
+        target = 0.9 * self.max_bytes
+        for e in entries:
+            if self.total_bytes <= target:
+                break
+            try:
+                size = e.stat().st_size
+                os.remove(e.path)
+                self.total_bytes -= size
+            except FileNotFoundError:
+                pass # already evicted by another worker
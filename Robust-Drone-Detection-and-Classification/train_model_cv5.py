@@ -9,6 +9,9 @@ from scipy import signal
 from torch.utils.data import Dataset, DataLoader
 from torchaudio.transforms import Spectrogram
 import lib.model_VGG2D
+from lib.iq_shards import IQShardReader
+from lib.spec_cache import SpectrogramCache
+from lib.freq_band import band_index
 from sklearn.model_selection import train_test_split
 
 from torch.utils.tensorboard import SummaryWriter
@@ -27,14 +30,20 @@ print("PYTORCH_CUDA_ALLOC_CONF set to:", os.environ.get("PYTORCH_CUDA_ALLOC_CONF
 class drone_data_dataset(Dataset):
     """
     Dataset class for drone IQ Signals + transform to spectrogram
+
+    Without a transform the raw IQ data is returned and transformed_data is an
+    empty tensor, so the spectrogram can be computed per batch in the training
+    loop (see batch_to_inputs). With a transform and a cache the spectrogram
+    is computed in the DataLoader worker and iq_data is left empty.
     """
-    def __init__(self, path, transform=None, device=None):
+    def __init__(self, path, transform=None, device=None, cache=None):
         self.path = path
         self.files = os.listdir(path)
         self.files = [f for f in self.files if f.endswith('pt')] # filter for files with .pt extension  
         self.files = [f for f in self.files if f.startswith('IQdata_sample')] # filter for files which start with IQdata_sample in name
         self.transform = transform
         self.device = device
+        self.cache = cache # optional SpectrogramCache for the transformed data
 
         # create list of tragets and snrs for all samples
         self.targets = []
@@ -50,6 +59,13 @@ class drone_data_dataset(Dataset):
     def __getitem__(self, idx):
         file = self.files[idx]
         sample_id = int(file.split('_')[1][6:]) # get sample id from file name
+
+        if self.transform and self.cache:
+            transformed_data = self.cache.load(self.path + file)
+            if transformed_data is not None:
+                # cache hit: skip loading the IQ data, target and snr are known from the file name
+                return torch.empty(0), self.targets[idx], self.snrs[idx], sample_id, transformed_data
+
         data_dict = torch.load(self.path + file) # load data       
         iq_data = data_dict['x_iq']
         act_target = data_dict['y']
@@ -57,10 +73,14 @@ class drone_data_dataset(Dataset):
 
         if self.transform:
             if self.device:
-                iq_data = iq_data.to(device=device)
+                iq_data = iq_data.to(device=self.device)
             transformed_data = self.transform(iq_data)
+            if self.cache:
+                self.cache.store(self.path + file, transformed_data)
+                # same batch layout and types as cache hits
+                iq_data, act_target, act_snr = torch.empty(0), self.targets[idx], self.snrs[idx]
         else:
-            transformed_data = None
+            transformed_data = torch.empty(0) # placeholder, the default collate can't batch None
 
         return iq_data, act_target, act_snr, sample_id, transformed_data
     
@@ -74,6 +94,51 @@ class drone_data_dataset(Dataset):
         return self.files
 
 
+class drone_data_shard_dataset(Dataset):
+    """
+    Same samples and outputs as drone_data_dataset, read from memory-mapped
+    shards written by convert_to_shards.py instead of one .pt file per sample
+    """
+    def __init__(self, path, transform=None, device=None):
+        self.path = path
+        self.reader = IQShardReader(path)
+        self.files = self.reader.index['files']
+        self.transform = transform
+        self.device = device
+
+        # targets and snrs come from the shard index
+        self.targets = self.reader.index['y']
+        self.snrs = self.reader.index['snr']
+        self.sample_ids = self.reader.index['sample_id']
+
+    def __len__(self):
+        return len(self.reader)
+
+    def __getitem__(self, idx):
+        iq_data = torch.from_numpy(np.array(self.reader.read(idx))) # copy the record out of the page cache
+        act_target = self.targets[idx]
+        act_snr = self.snrs[idx]
+        sample_id = self.sample_ids[idx]
+
+        if self.transform:
+            if self.device:
+                iq_data = iq_data.to(device=self.device)
+            transformed_data = self.transform(iq_data)
+        else:
+            transformed_data = torch.empty(0) # placeholder, the default collate can't batch None
+
+        return iq_data, act_target, act_snr, sample_id, transformed_data
+
+    def get_targets(self): # return list of targets
+        return self.targets
+
+    def get_snrs(self): # return list of snrs
+        return self.snrs
+
+    def get_files(self):
+        return self.files
+
+
 class transform_spectrogram(torch.nn.Module):
     def __init__(
         self,
@@ -91,13 +156,16 @@ class transform_spectrogram(torch.nn.Module):
         super().__init__()
         self.spec = Spectrogram(n_fft=n_fft, win_length=win_length, hop_length=hop_length, window_fn=window_fn, power=power, normalized=normalized, center=center, onesided=onesided).to(device=device)   
         self.win_lengt = win_length
+        # everything the output depends on, used as spectrogram cache key
+        self.params = {'n_fft': n_fft, 'win_length': win_length, 'hop_length': hop_length, 'window_fn': window_fn.__name__,
+                       'power': power, 'normalized': normalized, 'center': center, 'onesided': onesided}
 
     def forward(self, iq_signal: torch.Tensor) -> torch.Tensor:
-        # Convert to spectrogram
-        iq_signal = iq_signal[0,:] + (1j * iq_signal[1,:]) # convert to complex signal
+        # Convert to spectrogram, works on one sample (2, N) or a batch (B, 2, N)
+        iq_signal = iq_signal[...,0,:] + (1j * iq_signal[...,1,:]) # convert to complex signal
         spec = self.spec(iq_signal)
         spec = torch.view_as_real(spec) # Returns a view of a complex input as a real tensor. last dimension of size 2 represents the real and imaginary components of complex numbers
-        spec = torch.moveaxis(spec,2,0) # move channel dimension to first dimension (1024, 1024, 2) -> (2, 1024, 1024)
+        spec = torch.moveaxis(spec,-1,-3) # move channel dimension in front of freq/time (..., 1024, 1024, 2) -> (..., 2, 1024, 1024)
         spec = spec/self.win_lengt # normalise by fft window size
         return spec
 
@@ -131,6 +199,8 @@ def get_model_spec(model_name, num_classes):
         return lib.model_VGG2D.vgg11(num_classes=num_classes)
     elif(model_name == 'vgg11_bn'):
         return lib.model_VGG2D.vgg11_bn(num_classes=num_classes)
+    elif(model_name == 'vgg11_bn_slim'):
+        return lib.model_VGG2D.vgg11_bn_slim(num_classes=num_classes)
     elif(model_name == 'vgg13'):
         return lib.model_VGG2D.vgg13(num_classes=num_classes)
     elif(model_name == 'vgg13_bn'):
@@ -148,6 +218,29 @@ def get_model_spec(model_name, num_classes):
         exit()
 
 
+def crop_input(spec, random_offset=False):
+    # reduced-resolution modes: keep freq_bins and a window of iq_window samples
+    # (= whole STFT frames, center=False). The window starts at a random frame
+    # for training batches, at the first frame for validation/test.
+    if freq_bins is not None:
+        spec = spec.index_select(-2, band_index(data_transform.spec.n_fft, freq_bins, spec.device))
+    if iq_window is not None:
+        n_frames = (iq_window - data_transform.spec.n_fft) // data_transform.spec.hop_length + 1
+        start = int(torch.randint(0, spec.shape[-1] - n_frames + 1, ())) if random_offset else 0
+        spec = spec[..., start:start + n_frames]
+    return spec
+
+
+def batch_to_inputs(iq_data, transformed_data, train=False):
+    # spectrograms from the dataset (cache) are used as they are, otherwise
+    # the whole batch of raw IQ is transformed at once on the device
+    if transformed_data.numel() > 0:
+        spec = transformed_data.to(device, non_blocking=True)
+    else:
+        spec = data_transform(iq_data.to(device, non_blocking=True))
+    return crop_input(spec, random_offset=train)
+
+
 def train_model_observe_snr_performance_spec(
     model, criterion, optimizer, scheduler,
     num_classes, num_epochs, snr_list_for_observation,
@@ -205,7 +298,7 @@ def train_model_observe_snr_performance_spec(
                 # for batch_id, (inputs_iq, inputs_spec, labels, snrs, duty_cycles) in enumerate(epoch_train_loop):
                 # iq_data, target, act_snr, sample_id, transformed_data = next(iter(epoch_train_loop))
                 for batch_id, (iq_data, target, act_snr, sample_id, transformed_data) in enumerate(epoch_train_loop):
-                    inputs = transformed_data.to(device)
+                    inputs = batch_to_inputs(iq_data, transformed_data, train=True)
                     labels = target.to(device)
                     
                     # add model graph to tensorboard
@@ -267,7 +360,7 @@ def train_model_observe_snr_performance_spec(
 
                 # iterate over data of the epoch (evaluation)
                 for batch_id, (iq_data, target, act_snr, sample_id, transformed_data) in enumerate(dataloaders[phase]):
-                    inputs = transformed_data.to(device)
+                    inputs = batch_to_inputs(iq_data, transformed_data)
                     labels = target.to(device)
                     snrs = act_snr.to(device)
 
@@ -391,7 +484,7 @@ def eval_model_spec(model, num_classes, data_loader):
 
     # iterate over data of the epoch (evaluation)
     for batch_id, (iq_data, target, act_snr, sample_id, transformed_data) in enumerate(data_loader):
-        inputs = transformed_data.to(device)
+        inputs = batch_to_inputs(iq_data, transformed_data)
         labels = target.to(device)
         snrs = act_snr.to(device)
 
@@ -419,15 +512,24 @@ def eval_model_spec(model, num_classes, data_loader):
 project_path = './'
 result_path = project_path + 'results/experiments/'
 data_path = './data/drone_RF_data/'
+shard_path = None # e.g. './data/drone_RF_shards/' after running convert_to_shards.py
+spec_cache_path = None # e.g. './data/spec_cache/' to keep spectrograms on disk across epochs
+spec_cache_dtype = 'float16' # 4 MB per (2, 512, 2048) sample, 'float32' for exact values
+spec_cache_max_gb = 100 # evict least recently used spectrograms beyond this size
 
 # global params
-num_workers = 0 # number of workers for data loader
+num_workers = 4 # number of workers for data loader (needs the fork start method, set to 0 on Windows)
+prefetch_factor = 2 # batches loaded in advance by each worker
 num_folds = 5 # number of folds for cross validation
 num_epochs = 50 # number of epochs to train
 batch_size = 2 # batch size
 learning_rate = 0.001 # start learning rate
 train_verbose = True  # show epoch
-model_name = 'vgg11_bn'
+split_seed = 0 # same train/val/test split in every experiment, so models can be compared on one test set
+model_name = 'vgg11_bn' # 'vgg11_bn_slim' trains the backend's cascade first tier
+# reduced-resolution input modes (the backend's CFG.iq_len / CFG.freq_bins must match):
+iq_window = None # samples per input, e.g. 262144 -> 512 time frames, None = the whole 1048576 sample recording
+freq_bins = None # (lo, hi) sub-band of the 512 STFT bins, 0 = lowest frequency, 256 = centre, e.g. (128, 384); None = all
 
 # set device
 device = torch.device('cuda:0' if torch.cuda.is_available() else 'cpu')
@@ -438,6 +540,10 @@ experiment_name = model_name + \
                 '_epochs' + str(num_epochs) + \
                 '_lr' + str(learning_rate) + \
                 '_batchsize' + str(batch_size)
+if iq_window is not None:
+    experiment_name += '_iq' + str(iq_window)
+if freq_bins is not None:
+    experiment_name += '_bins' + str(freq_bins[0]) + '-' + str(freq_bins[1])
 
 
 print('Starting experiment:', experiment_name)
@@ -461,10 +567,19 @@ class_names = dataset_stats['class'].values
 snr_stats = pd.read_csv(data_path + 'SNR_stats.csv', index_col=0)
 snr_list = snr_stats['SNR'].values
 
-# setup transform: IQ -> SPEC
+# setup transform: IQ -> SPEC, applied to whole batches in the training loop
 data_transform = transform_spectrogram(device=device) # create transform object
 # create dataset object
-drone_dataset = drone_data_dataset(path=data_path, device=device, transform=data_transform)
+if shard_path:
+    drone_dataset = drone_data_shard_dataset(path=shard_path)
+else:
+    spec_cache = None
+    dataset_transform = None
+    if spec_cache_path:
+        # spectrograms are cached per sample, so they are computed in the (CPU) DataLoader workers
+        dataset_transform = transform_spectrogram(device='cpu')
+        spec_cache = SpectrogramCache(spec_cache_path, dataset_transform.params, dtype=spec_cache_dtype, max_bytes=int(spec_cache_max_gb * 1e9))
+    drone_dataset = drone_data_dataset(path=data_path, transform=dataset_transform, cache=spec_cache)
 
 # split data with stratified kfold
 dataset_indices = list(range(len(drone_dataset)))
@@ -481,12 +596,12 @@ for fold in [0]:
     writer = SummaryWriter(act_result_path + 'runs/fold' + str(fold))
 
     # split data with stratified kfold with respect to target class
-    train_idx, test_idx = train_test_split(dataset_indices, test_size=1/num_folds, stratify=drone_dataset.get_targets())
+    train_idx, test_idx = train_test_split(dataset_indices, test_size=1/num_folds, stratify=drone_dataset.get_targets(), random_state=split_seed)
     y_test = [drone_dataset.get_targets()[x] for x in test_idx]
     y_train = [drone_dataset.get_targets()[x] for x in train_idx]
 
     # split val data from train data in stratified k-fold manner
-    train_idx, val_idx = train_test_split(train_idx, test_size=1/num_folds, stratify=y_train)
+    train_idx, val_idx = train_test_split(train_idx, test_size=1/num_folds, stratify=y_train, random_state=split_seed)
     y_val = [drone_dataset.get_targets()[x] for x in val_idx]
     y_train = [drone_dataset.get_targets()[x] for x in train_idx]
 
@@ -503,26 +618,31 @@ for fold in [0]:
     # define weighted random sampler with the weighted train samples
     train_sampler = torch.utils.data.WeightedRandomSampler(train_samples_weight.type('torch.DoubleTensor'), len(train_samples_weight))
 
+    # workers only load and unpickle samples, the spectrogram is computed per batch on the device
+    loader_kwargs = dict(
+        num_workers=num_workers,
+        persistent_workers=num_workers > 0,
+        prefetch_factor=prefetch_factor if num_workers > 0 else None,
+        multiprocessing_context='fork' if num_workers > 0 else None, # this script has no __main__ guard
+        pin_memory=device.type == 'cuda')
+
     train_loader = DataLoader(
         dataset=train_dataset,
         batch_size=batch_size,
         sampler=train_sampler,
-        num_workers=num_workers, 
-        pin_memory=False)
+        **loader_kwargs)
 
     val_loader = DataLoader(
         dataset=val_dataset,
         batch_size=batch_size,
         shuffle=True,
-        num_workers=num_workers,
-        pin_memory=False)
+        **loader_kwargs)
 
     test_loader = DataLoader(
         dataset=test_dataset,
         batch_size=batch_size,
         shuffle=True,
-        num_workers=num_workers,
-        pin_memory=False)
+        **loader_kwargs)
 
     dataloaders = {'train': train_loader, 'val': val_loader, 'test': test_loader}
     dataset_sizes = {'train': len(train_dataset), 'val': len(val_dataset), 'test': len(test_dataset)}
@@ -685,7 +805,8 @@ for fold in [0]:
                     'class_names': class_names,
                     'train_idx': train_idx,
                     'val_idx': val_idx,
-                    'test_idx': test_idx
+                    'test_idx': test_idx,
+                    'test_files': [drone_dataset.get_files()[x] for x in test_idx] # held-out set of the backend's check_*.py
                     }
     save_filename = 'results_fold' + str(fold) + '.pkl'
 
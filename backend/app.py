@@ -1,14 +1,21 @@
+import asyncio
 import threading
 import time
 import torch
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel
 
 from config import CFG
-from model_loader import load_model
-from pipeline import TransformSpectrogram, infer_one
+from model_loader import load_model, load_compiled_model, load_onnx_model, load_calibration_inputs
+from pipeline import TransformSpectrogram, BatchCollector, StreamingSpectrogram, ProgressiveSpectrogram, NoiseGate, ModelCascade, dc_row, infer_spec, warmup
+from ring import DutyCycle
 from store import STORE
-from sources.pt_source import PtFileSource
+from broadcast import HUB, sse_frame
+from metrics import METRICS
+from profiling import PROFILER
+from logbuffer import RingLogHandler, DeferredQueueHandler, JsonLinesFormatter, tail_file
+from sources.manager import SourceManager, build_sources
 from fastapi import Query
 import glob
 from fastapi.middleware.cors import CORSMiddleware
@@ -17,9 +24,12 @@ from fastapi.middleware.cors import CORSMiddleware
 # app.py - top of file (after imports, before anything else)
 # ────────────────────────────────────────────────────────────────
 
+import atexit
 import logging
+import math
 import logging.handlers
 import os
+import queue
 import sys
 from datetime import datetime
 
@@ -36,7 +46,7 @@ log_filename = os.path.join(
 
 # Create logger
 logger = logging.getLogger("drone_rf_backend")
-logger.setLevel(logging.DEBUG)          # Capture everything; we'll filter by handler
+logger.setLevel(CFG.log_level)          # DEBUG = capture everything; we'll filter by handler
 
 # Formatter (human-readable + machine-parsable)
 formatter = logging.Formatter(
@@ -57,11 +67,22 @@ file_handler = logging.handlers.RotatingFileHandler(
     encoding='utf-8'
 )
 file_handler.setLevel(logging.DEBUG)    # Log DEBUG+ to file
-file_handler.setFormatter(formatter)
-
-# Add handlers
-logger.addHandler(console_handler)
-logger.addHandler(file_handler)
+file_handler.setFormatter(JsonLinesFormatter() if CFG.log_format == "jsonl" else formatter)
+
+# 3. In-memory ring (recent lines for /logs, no file reads)
+ring_handler = RingLogHandler(CFG.log_ring_lines)
+ring_handler.setLevel(logging.DEBUG)
+ring_handler.setFormatter(formatter)
+
+# Add handlers behind a queue: callers (inference thread included) only enqueue
+# the record, formatting and console/file I/O happen on the listener thread
+log_queue = queue.SimpleQueue()
+log_listener = logging.handlers.QueueListener(
+    log_queue, console_handler, file_handler, ring_handler, respect_handler_level=True
+)
+logger.addHandler(DeferredQueueHandler(log_queue))
+log_listener.start()
+atexit.register(log_listener.stop)      # flush what's still queued on shutdown
 
 # Optional: quieter third-party loggers
 logging.getLogger("pyhackrf").setLevel(logging.WARNING)
@@ -74,7 +95,8 @@ logger.info(f"Python: {sys.version.split()[0]} | PyTorch: {torch.__version__}")
 logger.info(f"Device: {device}")
 logger.info(f"Model: {CFG.model_name}  | Classes: {CFG.num_classes}  | Noise index: {CFG.noise_index}")
 logger.info(f"Best checkpoint: {CFG.best_model_path}")
-logger.info(f"Spectrogram: n_fft={CFG.n_fft}, hop={CFG.hop_length}")
+logger.info(f"Engine: {CFG.engine} | Precision: {CFG.precision}")
+logger.info(f"Spectrogram: n_fft={CFG.n_fft}, hop={CFG.hop_length}, iq_len={CFG.iq_len}, freq_bins={CFG.freq_bins}")
 logger.info(f"Detection threshold: {CFG.threshold:.3f}")
 logger.info("═" * 70)
 
@@ -95,96 +117,444 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],   # allow GET, POST, etc.
     allow_headers=["*"],   # allow all headers
+    expose_headers=["ETag"],
 )
 
 
-model = load_model(CFG.best_model_path, CFG.model_name, CFG.num_classes, device)
-transform = TransformSpectrogram(device, CFG.n_fft, CFG.win_length, CFG.hop_length)
-
-# Start with PT source (easy debugging)
-source = PtFileSource(
-    pt_path_or_dir="/home/ghoth/thesis_drone_detection/Robust-Drone-Detection-and-Classification/data/drone_RF_data/",
-    loop=True,
-    sleep_s=0.1
-)
-
-worker_thread = None
+if CFG.ring_capacity <= CFG.max_batch_size:
+    raise ValueError(f"ring_capacity={CFG.ring_capacity} must be larger than max_batch_size={CFG.max_batch_size}: "
+                     f"a full batch would hold every slot and nothing could be captured during inference")
+
+# the model was trained on iq_len chunks: stream windows must be that wide too
+input_frames = CFG.iq_len // CFG.hop_length
+stream_window_frames = CFG.stream_window_frames or input_frames
+if CFG.stream_mode and stream_window_frames != input_frames:
+    raise ValueError(f"stream_window_frames={stream_window_frames} does not match the model input width "
+                     f"iq_len // hop_length = {input_frames}")
+
+transform = TransformSpectrogram(device, CFG.n_fft, CFG.win_length, CFG.hop_length, reuse_output=True,
+                                freq_bins=CFG.freq_bins, max_batch_size=CFG.max_batch_size)
+calib_transform = TransformSpectrogram(device, CFG.n_fft, CFG.win_length, CFG.hop_length, freq_bins=CFG.freq_bins)
+gate = None
+if CFG.gate_enabled:
+    gate = NoiseGate(
+        CFG.num_classes, CFG.noise_index,
+        max_excess_db=CFG.gate_max_excess_db,
+        max_occupancy=CFG.gate_max_occupancy,
+        occupancy_k=CFG.gate_occupancy_k,
+        audit_rate=CFG.gate_audit_rate,
+        dc_row=dc_row(CFG.n_fft, CFG.freq_bins),
+    )
+model = None
+model_artifact = None
+model_ready = threading.Event()
+model_error = None          # set when init_model fails, reported by /start and /health
+
+def load_engine(checkpoint_path, model_name):
+    """One model through the configured engine/precision. returns (model, artifact path or None)"""
+    calib_inputs_fn = lambda: load_calibration_inputs(CFG.calib_dir, calib_transform, CFG.calib_samples, device,
+                                                      iq_len=CFG.iq_len)
+    input_shape = (1, 2, transform.n_bins, input_frames)
+    if CFG.engine == "onnx":
+        if CFG.precision != "fp32":
+            logger.warning(f"engine=onnx runs fp32, ignoring precision={CFG.precision}")
+        return load_onnx_model(
+            checkpoint_path, model_name, CFG.num_classes, input_shape, CFG.artifact_dir,
+            intra_op_threads=CFG.onnx_intra_op_threads, parity_atol=CFG.onnx_parity_atol,
+            fold_bn=CFG.fold_bn)
+    if CFG.compile_model:
+        return load_compiled_model(
+            checkpoint_path, model_name, CFG.num_classes, device,
+            input_shape, CFG.artifact_dir, precision=CFG.precision,
+            calib_inputs_fn=calib_inputs_fn, fold_bn=CFG.fold_bn,
+            calib_key={"dir": CFG.calib_dir, "samples": CFG.calib_samples})
+    calib_inputs = calib_inputs_fn() if CFG.precision == "int8_static" else None
+    return load_model(checkpoint_path, model_name, CFG.num_classes, device,
+                      precision=CFG.precision, calib_inputs=calib_inputs, fold_bn=CFG.fold_bn), None
+
+def init_model():
+    """Loads (or builds) the model(s) and warms them up; /start waits for this."""
+    global model, model_artifact, model_error
+    t0 = time.time()
+    try:
+        heavy, model_artifact = load_engine(CFG.best_model_path, CFG.model_name)
+        tiers = [heavy]
+        if CFG.cascade_enabled:
+            slim, slim_artifact = load_engine(CFG.cascade_model_path, CFG.cascade_model_name)
+            logger.info(f"Cascade: {CFG.cascade_model_name} first, {CFG.model_name} below "
+                        f"margin={CFG.cascade_margin} | slim artifact: {slim_artifact}")
+            tiers.append(slim)
+        # each tier warmed on its own: through the cascade the heavy one might never run
+        for tier in tiers:
+            warmup(tier, transform, device, CFG.iq_len,
+                   batch_sizes=sorted({1, CFG.max_batch_size}), runs=CFG.warmup_runs)
+        model = ModelCascade(slim, heavy, CFG.cascade_margin) if CFG.cascade_enabled else heavy
+    except Exception as e:
+        logger.critical("Model initialisation failed", exc_info=True)
+        model_error = f"{type(e).__name__}: {e}"
+        return
+    model_ready.set()
+    logger.info(f"Model ready in {time.time() - t0:.1f} s")
+
+threading.Thread(target=init_model, daemon=True).start()
+
+progressive = False
+capture_len = CFG.iq_len        # samples per source read / ring slot
+if CFG.progressive_mode:
+    if CFG.stream_mode:
+        logger.warning("progressive_mode only applies to chunk mode, ignored with stream_mode")
+    elif CFG.engine == "onnx":
+        logger.warning("progressive_mode needs a model that takes any input width, "
+                       "the ONNX export has a fixed one; ignored")
+    else:
+        if CFG.iq_len % CFG.hop_length:
+            raise ValueError(f"progressive_mode needs iq_len={CFG.iq_len} to be a multiple of "
+                             f"hop_length={CFG.hop_length}, chunks are captured in whole-frame pieces")
+        progressive = True
+        # sources deliver chunks in pieces that end on every prefix step, so a
+        # prefix is classified as soon as its samples are captured
+        steps = [max(1, min(input_frames, round(input_frames * f))) for f in (*CFG.progressive_fractions, 1.0)]
+        capture_len = math.gcd(*steps) * CFG.hop_length
+        logger.info(f"Progressive mode: fractions={CFG.progressive_fractions} | pieces of {capture_len} samples | "
+                    f"provisional threshold={CFG.progressive_threshold}")
+
+# Sources are opened once (CFG.sources: .pt dirs, shards, HackRFs); rings are made per /start
+sources = build_sources(CFG.sources, capture_len)
+logger.info(f"Sources: {', '.join(f'{source_id} ({kind})' for source_id, kind, _ in sources)}")
+
+worker_threads = []
 stop_flag = threading.Event()
+source_manager = None
+inference_duty = DutyCycle()
 
 class Settings(BaseModel):
     threshold: float | None = None
-
-def worker_loop():
-    chunk_count = 0
-    start_time = time.time()
-
-    while not stop_flag.is_set():
-        chunk_count += 1
-        out = source.read_iq_chunk()
+    progressive_threshold: float | None = None
+
+def producer_loop(manager, channel):
+    while not stop_flag.is_set() and not channel.ring.closed:
+        t0 = time.perf_counter()
+        out = channel.source.read_iq_chunk()
+        read_s = time.perf_counter() - t0
+        channel.capture_duty.add(read_s)
+        METRICS.observe("read", read_s)
         if out is None:
-            logger.warning("Source returned None → stopping loop")
+            logger.warning(f"Source {channel.id} returned None → stopping its loop")
             break
 
         iq, meta = out
-
-        try:
-            pred_obj = infer_one(model, transform, iq, device=device)
-            pred = pred_obj["pred"]
-            conf  = pred_obj["confidence"]
-            detected = (pred != CFG.noise_index) and (conf > CFG.threshold)
-
-            result = {
-                "timestamp": meta.get("ts", time.time()),
-                "meta": meta,
-                "pred": pred,
-                "label": CFG.class_names[pred],
-                "confidence": conf,
-                "detected": detected,
-                "threshold": CFG.threshold,
-                "latency_ms": pred_obj["latency_ms"],
-                "spec_shape": pred_obj["spec_shape"],
-            }
-
-            STORE.set_latest(result)
-            if detected:
-                STORE.add_event(result)
-
-            # ─── Logging ───────────────────────────────────────
-            log_msg = (
-                f"Chunk {chunk_count:4d} | "
-                f"pred={pred} ({CFG.class_names[pred]:<12}) | "
-                f"conf={conf:5.3f} | "
-                f"lat={pred_obj['latency_ms']:6.1f} ms | "
-                f"detected={detected}"
+        if iq is None:
+            METRICS.inc("read_errors")
+            continue  # transient read error, already logged by the source
+        METRICS.inc("chunks_read")
+        meta["source_id"] = channel.id
+        meta["capture_ms"] = read_s * 1000.0
+        manager.put(channel, iq, meta)
+        # the source's throttle, outside the read timing (read stage and capture duty count real reads only)
+        time.sleep(getattr(channel.source, "sleep_s", 0.0))
+
+    manager.close_channel(channel)
+
+def publish_result(pred_obj, meta, chunk_count):
+    pred = pred_obj["pred"]
+    conf  = pred_obj["confidence"]
+    provisional = pred_obj.get("fraction", 1.0) < 1.0
+    threshold = CFG.progressive_threshold if provisional else CFG.threshold
+    detected = (pred != CFG.noise_index) and (conf > threshold)
+
+    result = {
+        "timestamp": meta.get("ts", time.time()),
+        "meta": meta,
+        "pred": pred,
+        "label": CFG.class_names[pred],
+        "confidence": conf,
+        "detected": detected,
+        "threshold": CFG.threshold,
+        "latency_ms": pred_obj["latency_ms"],
+        "spec_shape": pred_obj["spec_shape"],
+    }
+    if "gate" in pred_obj:
+        result["gated"] = pred_obj["gate"]["gated"] and not pred_obj["gate"]["audit"]
+    if "fraction" in pred_obj:
+        result["provisional"] = provisional
+        result["provisional_threshold"] = CFG.progressive_threshold
+        result["fraction"] = pred_obj["fraction"]
+
+    if not provisional and source_manager is not None and meta.get("source_id") in source_manager.channels:
+        source_manager.channels[meta["source_id"]].record(result)
+    snap = STORE.set_latest(result)
+    payload = snap.body.decode()            # serialized once for /latest and /stream
+    HUB.publish("result", result, payload)
+    if detected and not pred_obj.get("detected_early"):   # one event per chunk: its first detection
+        event = dict(result, id=STORE.add_event(result))     # same row shape as /events
+        HUB.publish("detection", event)
+        METRICS.inc("detections")
+
+    # ─── Logging ───────────────────────────────────────
+    # %-style args: the line is only built by the log listener, and not at all
+    # for plain chunks when DEBUG is off
+    level = logging.INFO if detected else logging.DEBUG
+    if logger.isEnabledFor(level):
+        logger.log(
+            level,
+            "Chunk %4d | src=%s | pred=%d (%-12s) | conf=%5.3f | lat=%6.1f ms | batch=%d | detected=%s%s",
+            chunk_count, meta.get("source_id"), pred, CFG.class_names[pred], conf,
+            pred_obj["latency_ms"], pred_obj["batch_size"], detected,
+            f" | provisional {pred_obj['fraction']:.2f}" if provisional else "",
+        )
+    return result
+
+def follows(last_seq, channel, meta):
+    """True unless chunks of the source were dropped since the last one taken from its ring."""
+    prev = last_seq.get(channel.id)
+    last_seq[channel.id] = meta["seq"]
+    return prev is None or meta["seq"] == prev + 1
+
+def infer_streaming(streamers, last_seq, batch):
+    """Pushes ring chunks through their source's rolling STFT; one result per emitted window."""
+    outputs = []
+    for iq, meta, t_enq, _, channel in batch:
+        if not follows(last_seq, channel, meta):
+            streamers[channel.id].reset()       # the stream has a gap, don't stitch frames across it
+        t0 = time.perf_counter()
+        for spec, frame_end in streamers[channel.id].push(iq):
+            METRICS.observe("transform", time.perf_counter() - t0)   # rolling STFT up to this window
+            timings = {}
+            pred_obj = infer_spec(model, spec, device, timings, gate)[0]
+            observe_stages(timings)
+            pred_obj["latency_ms"] = (time.perf_counter() - t_enq) * 1000.0
+            outputs.append((pred_obj, dict(meta, frame_end=frame_end)))
+            t0 = time.perf_counter()
+    return outputs
+
+def infer_progressive(accumulators, chunks, last_seq, batch, chunk_count):
+    """
+    Pushes ring pieces into their source's ProgressiveSpectrogram. Every
+    prefix step a piece completes is classified right away and published as
+    provisional; returns the final outputs of the chunks this batch completed.
+    Steps are skipped while the source's next piece is already waiting (the
+    consumer is behind, a longer prefix is at hand). Final results of chunks
+    already detected on a prefix carry detected_early.
+    """
+    outputs = []
+    for i, (iq, meta, t_enq, _, channel) in enumerate(batch):
+        if stop_flag.is_set():
+            break
+        acc = accumulators[channel.id]
+        chunk = chunks.get(channel.id)
+        gap = not follows(last_seq, channel, meta)
+        if acc.samples and acc.samples < acc.chunk_len and (gap or meta.get("visit") != chunk["meta"].get("visit")):
+            # pieces were dropped (or the scanner moved on): don't stitch across the gap
+            acc.reset()
+        if acc.samples in (0, acc.chunk_len):
+            if meta.get("offset", 0) != 0:
+                continue                    # the start of this chunk was dropped, wait for the next one
+            # capture of the chunk started with this piece's read
+            chunks[channel.id] = chunk = {"meta": meta, "t_start": t_enq - meta.get("capture_ms", 0.0) / 1000.0,
+                                          "detected_early": False}
+
+        t0 = time.perf_counter()
+        out = acc.push(iq)
+        if out is None:
+            continue
+        spec, frames = out
+        full = frames == acc.chunk_frames
+        behind = any(item[4] is channel for item in batch[i + 1:]) or channel.ring.depth() > 0
+        if not full and behind:
+            continue
+        METRICS.observe("transform", time.perf_counter() - t0)
+        timings = {}
+        pred_obj = infer_spec(model, spec, device, timings, gate if full else None)[0]
+        observe_stages(timings)
+        pred_obj["latency_ms"] = (time.perf_counter() - t_enq) * 1000.0
+        pred_obj["fraction"] = frames / acc.chunk_frames
+        pred_obj["frames"] = frames
+        pred_obj["detected_early"] = chunk["detected_early"]
+        pred_obj["t_start"] = chunk["t_start"]
+        if full:
+            outputs.append((pred_obj, chunk["meta"]))
+            continue
+        result = publish_result(pred_obj, chunk["meta"], chunk_count + len(outputs) + 1)
+        METRICS.inc("provisional_results")
+        if result["detected"] and not chunk["detected_early"]:
+            chunk["detected_early"] = True
+            METRICS.observe("first_detection", time.perf_counter() - chunk["t_start"])
+            METRICS.inc("provisional_detections")
+    return outputs
+
+def observe_stages(timings):
+    for stage, seconds in timings.items():
+        METRICS.observe(stage, seconds)
+
+def consumer_loop(manager, duty):
+    chunk_count = 0
+    start_time = time.time()
+    # chunks from every source share the batches (and the one model)
+    collector = BatchCollector(CFG.max_batch_size, CFG.max_batch_wait_ms, get=manager.get)
+    streamers = None
+    if CFG.stream_mode:
+        # one rolling STFT per source: frames must never be stitched across streams
+        streamers = {
+            source_id: StreamingSpectrogram(
+                device, CFG.n_fft, CFG.win_length, CFG.hop_length,
+                window_frames=stream_window_frames,
+                stride_frames=CFG.stream_stride_frames,
+                freq_bins=CFG.freq_bins,
             )
-
-            if detected:
-                logger.info(log_msg)
+            for source_id in manager.channels
+        }
+    accumulators = chunks = None
+    if progressive:
+        # one chunk in progress per source, built from its pieces
+        accumulators = {
+            source_id: ProgressiveSpectrogram(
+                device, CFG.n_fft, CFG.win_length, CFG.hop_length, CFG.iq_len,
+                fractions=CFG.progressive_fractions, freq_bins=CFG.freq_bins,
+            )
+            for source_id in manager.channels
+        }
+        chunks = {}
+    last_seq = {}       # per source: ring seq of the last chunk pushed
+    window_latency_ms, window_n = 0.0, 0     # latency summed over the chunks since the last summary
+
+    # after /stop, chunks still queued in the rings are left unread
+    while not manager.drained() and not stop_flag.is_set():
+        batch = collector.next_batch(timeout=0.5)
+        if not batch:
+            continue
+
+        t0 = time.perf_counter()
+        for item in batch:
+            METRICS.observe("queue", t0 - item[2])
+        METRICS.inc("batches")
+        PROFILER.begin()
+        try:
+            if streamers is not None:
+                outputs = infer_streaming(streamers, last_seq, batch)
+            elif progressive:
+                outputs = infer_progressive(accumulators, chunks, last_seq, batch, chunk_count)
             else:
-                logger.debug(log_msg)
+                timings = {}
+                outputs = collector.infer(model, transform, batch, device, timings, gate)
+                observe_stages(timings)
+        except Exception as e:
+            logger.error(f"Inference failed on chunks {chunk_count + 1}-{chunk_count + len(batch)}", exc_info=True)
+            METRICS.inc("inference_errors")
+            PROFILER.end(len(batch))
+            chunk_count += len(batch)
+            time.sleep(1)  # prevent spam
+            continue
+        finally:
+            manager.release(batch)
+            duty.add(time.perf_counter() - t0)
+
+        for pred_obj, meta in outputs:
+            if stop_flag.is_set():
+                break                           # stopped during inference: don't publish stale results
+            chunk_count += 1
+            t_store = time.perf_counter()
+            result = publish_result(pred_obj, meta, chunk_count)
+            store_s = time.perf_counter() - t_store
+            if result["detected"] and not pred_obj.get("detected_early"):
+                # from the start of the chunk's capture (progressive mode: of its first piece)
+                t_start = pred_obj.get("t_start")
+                if t_start is None:
+                    t_start = t_store - (pred_obj["latency_ms"] + meta.get("capture_ms", 0.0)) / 1000.0
+                METRICS.observe("first_detection", time.perf_counter() - t_start)
+            METRICS.observe("store", store_s)
+            METRICS.observe("total", pred_obj["latency_ms"] / 1000.0 + store_s)
+            METRICS.inc("chunks_inferred")
+            window_latency_ms += pred_obj["latency_ms"]
+            window_n += 1
 
             # Periodic summary every 30 chunks
             if chunk_count % 30 == 0:
                 elapsed = time.time() - start_time
+                p95 = METRICS.stages["total"].quantile(0.95)
                 logger.info(
                     f"Summary @ chunk {chunk_count} | "
                     f"rate={chunk_count/elapsed:.1f} chunks/s | "
-                    f"avg_latency={pred_obj['latency_ms']:.1f} ms"
+                    f"avg_latency={window_latency_ms / window_n:.1f} ms | "
+                    f"p95_latency={p95 * 1000.0:.1f} ms | "
+                    f"dropped={manager.dropped_chunks()} | "
+                    f"coverage={manager.coverage():.2f}"
                 )
-
-        except Exception as e:
-            logger.error(f"Inference failed on chunk {chunk_count}", exc_info=True)
-            time.sleep(1)  # prevent spam
+                window_latency_ms, window_n = 0.0, 0
+
+        PROFILER.end(len(batch))
+
+    PROFILER.end(0, final=True)
+    if manager is source_manager:
+        STORE.running = False
+    logger.info(f"Consumer stopped after {chunk_count} chunks")
+
+def pipeline_stats():
+    if source_manager is None:
+        return {"status": "not started"}
+    return {
+        "sources": source_manager.stats(),
+        "coverage": source_manager.coverage(),
+        "inference_duty_cycle": inference_duty.value(),
+        "stream": HUB.stats(),
+        "stages": METRICS.summary(),
+        "gate": gate.stats() if gate is not None else None,
+        "cascade": model.stats() if isinstance(model, ModelCascade) else None,
+    }
+
+def per_source(fn):
+    """{source_id: fn(channel)} while running, for labelled gauges."""
+    if source_manager is None:
+        return None
+    return {source_id: fn(ch) for source_id, ch in source_manager.channels.items()}
+
+METRICS.gauge("ring_depth", "Chunks waiting in the source's capture ring",
+              lambda: per_source(lambda ch: ch.ring.depth()), label="source")
+METRICS.gauge("ring_dropped_chunks", "Chunks dropped by the source's ring since /start",
+              lambda: per_source(lambda ch: ch.ring.dropped_chunks), label="source")
+METRICS.gauge("ring_coverage", "Fraction of the source's samples that reached inference since /start",
+              lambda: per_source(lambda ch: ch.ring.stats()["coverage"]), label="source")
+METRICS.gauge("capture_duty_cycle", "Fraction of wall time spent reading the source",
+              lambda: per_source(lambda ch: ch.capture_duty.value()), label="source")
+METRICS.gauge("source_detections", "Detections per source since /start",
+              lambda: per_source(lambda ch: ch.detections), label="source")
+METRICS.gauge("inference_duty_cycle", "Fraction of wall time spent in inference",
+              lambda: inference_duty.value() if source_manager is not None else None)
+METRICS.gauge("gate_hit_rate", "Fraction of chunks the noise gate answered without the model",
+              lambda: gate.stats()["hit_rate"] if gate is not None else None)
+METRICS.gauge("gate_audit_misses", "Audited gated chunks the model classified as a drone",
+              lambda: gate.stats()["audit_misses"] if gate is not None else None)
+METRICS.gauge("cascade_escalation_rate", "Fraction of chunks the slim model passed on to the heavy model",
+              lambda: model.stats()["escalation_rate"] if isinstance(model, ModelCascade) else None)
+METRICS.gauge("cascade_tier_ms", "Mean latency per call of each cascade tier",
+              lambda: {tier: t["mean_ms"] for tier, t in model.stats()["tiers"].items()}
+              if isinstance(model, ModelCascade) else None, label="tier")
+METRICS.gauge("stream_subscribers", "Connected /stream clients", lambda: HUB.stats()["subscribers"])
+METRICS.gauge("running", "1 while the pipeline is running", lambda: int(STORE.running))
 
 @app.post("/start")
 def start():
-    global worker_thread
+    global worker_threads, source_manager, inference_duty
     if STORE.running:
         return {"ok": True, "status": "already running"}
+    if model_error is not None:
+        return {"ok": False, "status": "model failed", "error": model_error}
+    if not model_ready.is_set():
+        return {"ok": False, "status": "warming up"}
+    if any(t.is_alive() for t in worker_threads):
+        # the previous run's consumer may still be in a forward pass: two consumers
+        # would share the transform's buffers and publish into the same store
+        return {"ok": False, "status": "stopping"}
     stop_flag.clear()
     STORE.running = True
-    worker_thread = threading.Thread(target=worker_loop, daemon=True)
-    worker_thread.start()
+    source_manager = SourceManager.create(sources, capture_len, CFG.ring_capacity, CFG.overflow_policy)
+    inference_duty = DutyCycle()
+    worker_threads = [
+        threading.Thread(target=producer_loop, args=(source_manager, ch), daemon=True)
+        for ch in source_manager.channels.values()
+    ]
+    worker_threads.append(threading.Thread(target=consumer_loop, args=(source_manager, inference_duty), daemon=True))
+    for t in worker_threads:
+        t.start()
     return {"ok": True, "status": "started"}
 
 @app.post("/stop")
@@ -192,32 +562,140 @@ def stop():
     if not STORE.running:
         return {"ok": True, "status": "already stopped"}
     stop_flag.set()
+    source_manager.close()
     STORE.running = False
     return {"ok": True, "status": "stopping"}
 
+@app.get("/health")
+def health():
+    return {"ready": model_ready.is_set(), "running": STORE.running, "artifact": model_artifact,
+            "error": model_error}
+
+@app.get("/stats")
+def stats():
+    return pipeline_stats()
+
+@app.get("/sources")
+def list_sources():
+    """Per-source ring, duty cycle, result/detection counts and latest result."""
+    if source_manager is None:
+        return {source_id: {"type": kind, "status": "not started"} for source_id, kind, _ in sources}
+    return source_manager.stats()
+
+@app.post("/profile")
+def profile(chunks: int = Query(20, ge=1, le=1000), python: bool = False):
+    """
+    Profiles the next `chunks` chunks of the live pipeline with torch.profiler
+    (python=true adds a pyinstrument sampling profile, if installed).
+    Output lands in CFG.profile_dir; poll GET /profile for the file names.
+    """
+    ok = PROFILER.arm(chunks, python=python)
+    return {"ok": ok, "status": PROFILER.status}
+
+@app.get("/profile")
+def profile_status():
+    return PROFILER.status
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus scrape endpoint: stage latency histograms, counters, ring gauges."""
+    return PlainTextResponse(METRICS.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/latest")
-def latest():
-    return STORE.get_latest() or {"status": "no data yet"}
+async def latest(request: Request, wait: float = Query(0.0, ge=0.0, le=30.0)):
+    """
+    Latest result, pre-serialized, with an ETag. Send it back as If-None-Match
+    to get 304 while nothing changed; add wait=<s> to hold the request until a
+    newer result is published (long-poll) instead of polling.
+    """
+    snap = STORE.snapshot
+    known = request.headers.get("if-none-match")
+    if known == snap.etag and wait > 0:
+        snap = await STORE.wait_latest(snap.version, wait)
+    if known == snap.etag:
+        return Response(status_code=304, headers={"ETag": snap.etag})
+    return Response(snap.body, media_type="application/json", headers={"ETag": snap.etag, "Cache-Control": "no-cache"})
 
 @app.get("/events")
-def events(limit: int = 50):
-    return STORE.get_events(limit=limit)
+def events(
+    limit: int = Query(50, ge=1, le=1000),
+    since: int | None = None,
+    before: int | None = None,
+    label: str | None = None,
+    source: str | None = None,
+    t_from: float | None = None,
+    t_to: float | None = None,
+):
+    """
+    Detection history; every event carries its `id`.
+    since=<id>:  only newer events, oldest first (poll with the largest id seen)
+    before=<id>: older events, newest first (page back)
+    label, source (source id), t_from, t_to (unix seconds) filter either way.
+    """
+    return STORE.get_events(limit=limit, since=since, before=before, label=label, source=source,
+                            t_from=t_from, t_to=t_to)
+
+@app.get("/stream")
+async def stream(request: Request):
+    """
+    Server-Sent Events: `result` for every classified chunk, `detection` for
+    the ones that cross the threshold. Starts with the current latest result.
+    """
+    sub = HUB.subscribe(asyncio.get_running_loop())
+
+    async def frames():
+        try:
+            snap = STORE.snapshot
+            if snap.data is not None:
+                yield sse_frame("result", snap.data, snap.body.decode())
+            while not await request.is_disconnected():
+                sub.event.clear()
+                pending = sub.drain()
+                if pending:
+                    yield "".join(pending)
+                    continue
+                try:
+                    await asyncio.wait_for(sub.event.wait(), CFG.sse_keepalive_s)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+        finally:
+            HUB.unsubscribe(sub)
+
+    return StreamingResponse(
+        frames(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @app.post("/settings")
 def settings(s: Settings):
     if s.threshold is not None:
         CFG.threshold = float(s.threshold)
-    return {"ok": True, "threshold": CFG.threshold}
+    if s.progressive_threshold is not None:
+        CFG.progressive_threshold = float(s.progressive_threshold)
+    return {"ok": True, "threshold": CFG.threshold, "progressive_threshold": CFG.progressive_threshold}
 
 @app.get("/logs")
-def get_logs(lines: int = Query(80, ge=10, le=500)):
+def get_logs(
+    lines: int = Query(80, ge=10, le=500),
+    level: str = Query("DEBUG", pattern="^(DEBUG|INFO|WARNING|ERROR|CRITICAL)$"),
+    since: int = Query(0, ge=0),
+    source: str = Query("memory", pattern="^(memory|file)$"),
+):
+    """
+    memory: last lines from the in-memory ring; pass the returned `cursor` back
+            as `since` to get the lines logged after it, oldest first, `lines`
+            at a time. `missed` counts the ones already evicted from the ring.
+    file:   tail of the newest log file on disk (older history, no cursor).
+    """
+    min_level = logging.getLevelName(level)
+    if source == "memory":
+        data, cursor, missed = ring_handler.lines(lines, min_level=min_level, since=since)
+        return {"file": None, "lines": data, "cursor": cursor, "missed": missed}
+
     # get newest log file
     files = sorted(glob.glob("logs/*.log"))
     if not files:
         return {"lines": []}
     latest_file = files[-1]
-
-    # tail last N lines safely
-    with open(latest_file, "r", encoding="utf-8", errors="ignore") as f:
-        data = f.readlines()[-lines:]
-    return {"file": latest_file, "lines": [line.rstrip("\n") for line in data]}
+    return {"file": latest_file, "lines": tail_file(latest_file, lines, min_level=min_level)}
@@ -0,0 +1,89 @@
+import asyncio
+import json
+import threading
+from collections import deque
+
+from config import CFG
+
+
+def sse_frame(event, obj, payload=None):
+    """
+    One Server-Sent Events frame: `event:` line + single-line JSON payload.
+    `payload` is `obj` already serialized (e.g. a LatestSnapshot body), to skip json.dumps.
+    """
+    if payload is None:
+        payload = json.dumps(obj, default=str)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+class Subscriber:
+    """
+    One connected client. Frames land in a bounded deque from the worker
+    thread; the client's event loop is woken to drain it. A client that
+    can't keep up loses its oldest frames, it never blocks the publisher.
+    """
+    def __init__(self, loop, max_queue):
+        self.loop = loop
+        self.queue = deque(maxlen=max_queue)
+        self.event = asyncio.Event()
+        self.sent = 0
+        self.dropped = 0
+
+    def push(self, frame):
+        if len(self.queue) == self.queue.maxlen:
+            self.dropped += 1
+        self.queue.append(frame)
+        self.loop.call_soon_threadsafe(self.event.set)
+
+    def drain(self):
+        frames = []
+        while self.queue:
+            frames.append(self.queue.popleft())
+        self.sent += len(frames)
+        return frames
+
+
+class Broadcaster:
+    """
+    Fan-out hub between the inference thread and the /stream clients.
+    publish() serializes each message once, whatever the number of clients.
+    """
+    def __init__(self, max_queue=16):
+        self.max_queue = max_queue
+        self._subs = ()                  # copy-on-write, publish() iterates without the lock
+        self._lock = threading.Lock()
+        self.published = 0
+
+    def subscribe(self, loop=None):
+        sub = Subscriber(loop or asyncio.get_running_loop(), self.max_queue)
+        with self._lock:
+            self._subs = self._subs + (sub,)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subs = tuple(s for s in self._subs if s is not sub)
+
+    def publish(self, event, obj, payload=None):
+        subs = self._subs
+        self.published += 1
+        if not subs:
+            return
+        frame = sse_frame(event, obj, payload)
+        for sub in subs:
+            try:
+                sub.push(frame)
+            except RuntimeError:
+                # client's loop already closed; its generator will unsubscribe
+                pass
+
+    def stats(self):
+        subs = self._subs
+        return {
+            "subscribers": len(subs),
+            "published": self.published,
+            "sent": sum(s.sent for s in subs),
+            "dropped": sum(s.dropped for s in subs),
+        }
+
+HUB = Broadcaster(CFG.sse_queue_len)
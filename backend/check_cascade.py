@@ -0,0 +1,53 @@
+# Tunes CFG.cascade_margin on held-out .pt samples: for each margin, the share
+# of chunks the slim model escalates to the heavy one, the cascade's accuracy
+# and agreement with the heavy model alone, and the expected ms/chunk, on the
+# samples neither model was trained on (held_out.py; the slim model is
+# overconfident on its own training samples, which would bias the margin).
+#   python check_cascade.py
+import time
+import torch
+
+from config import CFG
+from model_loader import load_model
+from held_out import DEVICE, held_out_set, check_transform, held_out_inputs
+
+MARGINS = (0.5, 0.7, 0.8, 0.9, 0.95, 0.99, 1.01)    # 1.01 = always escalate (heavy model only)
+
+def main():
+    transform = check_transform(CFG.freq_bins)
+    heavy = load_model(CFG.best_model_path, CFG.model_name, CFG.num_classes, DEVICE, fold_bn=CFG.fold_bn)
+    slim = load_model(CFG.cascade_model_path, CFG.cascade_model_name, CFG.num_classes, DEVICE, fold_bn=CFG.fold_bn)
+
+    eval_files = held_out_set([CFG.best_model_path, CFG.cascade_model_path])
+
+    rows = []   # (y, slim pred, slim confidence, heavy pred)
+    slim_s = heavy_s = 0.0
+    with torch.no_grad():
+        for x, y, _ in held_out_inputs(transform, eval_files, CFG.iq_len):
+            t0 = time.time()
+            conf, pred = torch.softmax(slim(x), dim=1).max(dim=1)
+            t1 = time.time()
+            heavy_pred = int(heavy(x).argmax(dim=1))
+            t2 = time.time()
+            slim_s += t1 - t0
+            heavy_s += t2 - t1
+            rows.append((y, int(pred), float(conf), heavy_pred))
+
+    n = max(len(rows), 1)
+    slim_ms, heavy_ms = slim_s / n * 1000, heavy_s / n * 1000
+    print(f"{CFG.cascade_model_name} {slim_ms:.1f} ms/chunk | {CFG.model_name} {heavy_ms:.1f} ms/chunk")
+    print(f"{'margin':>8}{'escalated':>11}{'accuracy':>10}{'agreement':>11}{'ms/chunk':>10}")
+    for margin in MARGINS:
+        escalated = correct = agree = 0
+        for y, pred, conf, heavy_pred in rows:
+            if conf < margin:
+                escalated += 1
+                pred = heavy_pred
+            correct += pred == y
+            agree += pred == heavy_pred
+        mark = " *" if margin == CFG.cascade_margin else ""
+        print(f"{margin:>8.2f}{escalated/n:>11.3f}{correct/n:>10.4f}{agree/n:>11.4f}"
+              f"{slim_ms + escalated/n*heavy_ms:>10.1f}{mark}")
+
+if __name__ == "__main__":
+    main()
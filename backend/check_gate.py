@@ -0,0 +1,55 @@
+# Calibrates the noise gate (CFG.gate_*) on held-out .pt samples: for a grid of
+# thresholds, how many chunks it would answer without the model and how many
+# drone chunks it would wrongly call noise, on the checkpoint's test split
+# (held_out.py).
+#   python check_gate.py
+import time
+import torch
+
+from config import CFG
+from model_loader import load_model
+from pipeline import NoiseGate, dc_row
+from held_out import DEVICE, held_out_set, check_transform, held_out_inputs
+
+EXCESS_DB = (3.0, 4.5, 6.0, 9.0, 12.0)
+OCCUPANCY = (0.005, 0.01, 0.02, 0.05)
+
+def main():
+    transform = check_transform(CFG.freq_bins)
+    model = load_model(CFG.best_model_path, CFG.model_name, CFG.num_classes, DEVICE, fold_bn=CFG.fold_bn)
+    gate = NoiseGate(CFG.num_classes, CFG.noise_index, occupancy_k=CFG.gate_occupancy_k,
+                     dc_row=dc_row(CFG.n_fft, CFG.freq_bins))
+
+    eval_files = held_out_set([CFG.best_model_path])
+
+    rows = []   # (excess_db, occupancy, y, model pred)
+    gate_s = model_s = 0.0
+    with torch.no_grad():
+        for x, y, _ in held_out_inputs(transform, eval_files, CFG.iq_len):
+            t0 = time.time()
+            excess_db, occupancy = gate.measure(x)
+            t1 = time.time()
+            pred = int(model(x).argmax(dim=1))
+            t2 = time.time()
+            gate_s += t1 - t0
+            model_s += t2 - t1
+            rows.append((float(excess_db[0]), float(occupancy[0]), y, pred))
+
+    n = max(len(rows), 1)
+    n_noise = sum(y == CFG.noise_index for _, _, y, _ in rows)
+    print(f"gate {gate_s/n*1000:.2f} ms/chunk | model {model_s/n*1000:.1f} ms/chunk | "
+          f"{n_noise} noise / {len(rows) - n_noise} drone chunks")
+    print(f"{'max_excess_db':>14}{'max_occupancy':>15}{'gated':>8}{'noise gated':>13}"
+          f"{'drones gated':>14}{'model dets gated':>18}")
+    for e_max in EXCESS_DB:
+        for o_max in OCCUPANCY:
+            gated = [(y, p) for e, o, y, p in rows if e < e_max and o < o_max]
+            noise = sum(y == CFG.noise_index for y, _ in gated)
+            drones = len(gated) - noise                      # missed detections vs ground truth
+            dets = sum(p != CFG.noise_index for _, p in gated)   # ... vs what the model would have said
+            mark = " *" if (e_max, o_max) == (CFG.gate_max_excess_db, CFG.gate_max_occupancy) else ""
+            print(f"{e_max:>14.1f}{o_max:>15.3f}{len(gated)/n:>8.3f}{noise/max(n_noise, 1):>13.3f}"
+                  f"{drones:>14d}{dets:>18d}{mark}")
+
+if __name__ == "__main__":
+    main()
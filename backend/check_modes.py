@@ -0,0 +1,81 @@
+# Benchmarks the reduced-resolution input modes (CFG.iq_len / CFG.freq_bins):
+# latency of transform + model per chunk, and per-SNR accuracy on the samples
+# none of the trained modes saw in training (held_out.py; the first iq_len
+# samples of each).
+# A mode's model comes from train_model_cv5.py with the same iq_window /
+# freq_bins; modes without a checkpoint are timed with untrained weights.
+#   python check_modes.py
+import os
+import time
+import torch
+
+from config import CFG
+from model_loader import get_model, load_model
+from held_out import DEVICE, held_out_set, check_transform, held_out_inputs
+
+N_TIMING = 5
+EXPERIMENT = os.path.dirname(CFG.best_model_path)    # .../vgg11_bn_CV5_epochs50_lr0.001_batchsize2
+CKPT = os.path.basename(CFG.best_model_path)
+
+# name, iq_len, freq_bins, checkpoint
+MODES = [
+    ("full", 1048576, None, CFG.best_model_path),
+    ("iq256k", 262144, None, os.path.join(EXPERIMENT + "_iq262144", CKPT)),
+    ("band-half", 1048576, (128, 384), os.path.join(EXPERIMENT + "_bins128-384", CKPT)),
+    ("iq256k+band-half", 262144, (128, 384), os.path.join(EXPERIMENT + "_iq262144_bins128-384", CKPT)),
+]
+
+def main():
+    modes = []
+    for name, iq_len, freq_bins, path in MODES:
+        transform = check_transform(freq_bins)
+        trained = os.path.exists(path)
+        if trained:
+            model = load_model(path, CFG.model_name, CFG.num_classes, DEVICE, fold_bn=CFG.fold_bn)
+        else:
+            model = get_model(CFG.model_name, CFG.num_classes).eval()
+        modes.append({"name": name, "iq_len": iq_len, "transform": transform, "model": model,
+                      "trained": trained, "correct": {}, "count": {}})
+
+    with torch.no_grad():
+        for m in modes:
+            iq = torch.zeros(m["iq_len"], dtype=torch.complex64)
+            m["model"](m["transform"](iq).unsqueeze(0))     # first call allocates
+            t0 = time.time()
+            for _ in range(N_TIMING):
+                x = m["transform"](iq).unsqueeze(0)
+                m["model"](x)
+            m["ms"] = (time.time() - t0) / N_TIMING * 1000
+            m["shape"] = "x".join(str(d) for d in x.shape[1:])
+
+        trained = [path for *_, path in MODES if os.path.exists(path)]
+        eval_files = held_out_set(trained)
+        if not trained:
+            print("No mode checkpoint found: latency only")
+        for m in modes:
+            if not m["trained"]:
+                continue
+            for x, y, snr in held_out_inputs(m["transform"], eval_files, m["iq_len"]):
+                m["correct"][snr] = m["correct"].get(snr, 0) + (int(m["model"](x).argmax(dim=1)) == y)
+                m["count"][snr] = m["count"].get(snr, 0) + 1
+
+    snrs = sorted({snr for m in modes for snr in m["count"]})
+    accuracy = any(m["trained"] for m in modes)
+    print(f"{'mode':<18}{'input':>14}{'iq_len':>9}{'ms/chunk':>10}"
+          + (f"{'acc':>8}" if accuracy else "")
+          + "".join(f"{f'SNR {snr}':>9}" for snr in snrs))
+    for m in modes:
+        line = f"{m['name']:<18}{m['shape']:>14}{m['iq_len']:>9}{m['ms']:>10.1f}"
+        if accuracy:
+            n = sum(m["count"].values())
+            line += f"{sum(m['correct'].values()) / n:>8.4f}" if n else f"{'-':>8}"
+            line += "".join(
+                f"{m['correct'][snr] / m['count'][snr]:>9.4f}" if snr in m["count"] else f"{'-':>9}"
+                for snr in snrs
+            )
+            if not m["trained"]:
+                line += "   (no checkpoint, latency only)"
+        print(line)
+
+if __name__ == "__main__":
+    main()
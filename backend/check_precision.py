@@ -0,0 +1,44 @@
+# Compares every reduced-precision mode against fp32 on held-out .pt samples:
+# the checkpoint's test split (held_out.py), minus the first CFG.calib_samples
+# files of CFG.calib_dir that calibrate int8_static.
+#   python check_precision.py
+import os
+import time
+import torch
+
+from config import CFG
+from model_loader import PRECISIONS, load_model, apply_precision, load_calibration_inputs
+from held_out import DEVICE, held_out_set, check_transform, held_out_inputs
+
+def main():
+    transform = check_transform(CFG.freq_bins)
+    model_fp32 = load_model(CFG.best_model_path, CFG.model_name, CFG.num_classes, DEVICE, fold_bn=CFG.fold_bn)
+    calib_inputs = load_calibration_inputs(CFG.calib_dir, transform, CFG.calib_samples, DEVICE, iq_len=CFG.iq_len)
+
+    calib_files = sorted(f for f in os.listdir(CFG.calib_dir) if f.endswith(".pt"))[:CFG.calib_samples]
+    eval_files = held_out_set([CFG.best_model_path], exclude=calib_files)
+
+    models = {p: apply_precision(model_fp32, p, DEVICE, calib_inputs) for p in PRECISIONS}
+    correct = {p: 0 for p in PRECISIONS}
+    agree = {p: 0 for p in PRECISIONS}
+    elapsed = {p: 0.0 for p in PRECISIONS}
+
+    with torch.no_grad():
+        for x, y, _ in held_out_inputs(transform, eval_files, CFG.iq_len):
+            preds = {}
+            for p, model in models.items():
+                t0 = time.time()
+                preds[p] = int(model(x).argmax(dim=1))
+                elapsed[p] += time.time() - t0
+                correct[p] += preds[p] == y
+            for p in PRECISIONS:
+                agree[p] += preds[p] == preds["fp32"]
+
+    n = max(len(eval_files), 1)
+    print(f"{'precision':<14}{'accuracy':>10}{'Δacc vs fp32':>14}{'agreement':>11}{'ms/chunk':>10}")
+    for p in PRECISIONS:
+        print(f"{p:<14}{correct[p]/n:>10.4f}{(correct[p]-correct['fp32'])/n:>+14.4f}"
+              f"{agree[p]/n:>11.4f}{elapsed[p]/n*1000:>10.1f}")
+
+if __name__ == "__main__":
+    main()
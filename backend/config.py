@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 @dataclass
 class Config:
@@ -9,6 +9,33 @@ class Config:
     class_names = ['DJI','FutabaT14','FutabaT7','Graupner','Noise','Taranis','Turnigy']
     noise_index: int = 4
 
+    # Model cascade: a slim first tier (vgg11_bn_slim, train with train_model_cv5.py)
+    # classifies every chunk; the model above only runs on chunks whose slim top-1
+    # probability is below cascade_margin (tune with check_cascade.py)
+    cascade_enabled: bool = False
+    cascade_model_path: str = "/home/ghoth/thesis_drone_detection/Robust-Drone-Detection-and-Classification/results/experiments/vgg11_bn_slim_CV5_epochs50_lr0.001_batchsize2/best_model_fold0.pth"
+    cascade_model_name: str = "vgg11_bn_slim"
+    cascade_margin: float = 0.9
+
+    # Fold BatchNorm into the convolutions at load time (inference only)
+    fold_bn: bool = True
+
+    # Inference engine: torch (eager/TorchScript) | onnx (ONNX Runtime CPU, fp32 only)
+    engine: str = "torch"
+    onnx_intra_op_threads: int = 0         # 0 = ONNX Runtime default (one per physical core)
+    onnx_parity_atol: float = 1e-3
+
+    # TorchScript artifact cache and warm-up (fast restarts, no cold first chunk)
+    compile_model: bool = True
+    artifact_dir: str = "artifacts"
+    warmup_runs: int = 2
+
+    # Inference precision: fp32 | bf16 | int8_dynamic | int8_static (int8 = CPU only)
+    precision: str = "fp32"
+    # .pt samples used to calibrate int8_static (and by check_precision.py)
+    calib_dir: str = "/home/ghoth/thesis_drone_detection/Robust-Drone-Detection-and-Classification/data/drone_RF_data/"
+    calib_samples: int = 8
+
     # Preprocess (MUST match training)
     n_fft: int = 512
     win_length: int = 512
@@ -19,5 +46,86 @@ class Config:
 
     # IQ chunk size (matches dataset)
     iq_len: int = 1048576
+    # Reduced-resolution modes, for models trained with the same iq_window /
+    # freq_bins in train_model_cv5.py (compare them with check_modes.py):
+    #   iq_len=262144 → 512 time frames, a quarter of the conv work and of the wait for a chunk
+    #   freq_bins=(lo, hi) keeps that sub-band of the n_fft bins (0 = lowest frequency,
+    #   n_fft // 2 = centre), e.g. (128, 384) for the middle half
+    freq_bins: tuple | None = None
+
+    # Micro-batching (pending chunks are stacked into one forward pass)
+    max_batch_size: int = 4
+    max_batch_wait_ms: float = 20.0
+
+    # IQ sources, run side by side and all fed to the one model. Each gets its
+    # own chunk ring; "id" tags its chunks, results and events.
+    #   pt:     {"path": dir or .pt file, "loop", "sleep_s"}
+    #   shard:  {"path": shard dir (convert_to_shards.py), "loop", "sleep_s"}
+    #   hackrf: {"center_freq_hz", "sample_rate_hz", "gain_db", "sleep_s"}
+    #   hackrf_scan: {"bands": [{"name", "center_freq_hz", "dwell_s"}], "sample_rate_hz", "gain_db",
+    #                 "settle_s", "revisit_window_s", "hot_dwell_factor",
+    #                 "simulate": True + "sim_emitters": [freqs] to run without hardware}
+    sources: list = field(default_factory=lambda: [
+        {"id": "pt0", "type": "pt", "loop": True, "sleep_s": 0.1,
+         "path": "/home/ghoth/thesis_drone_detection/Robust-Drone-Detection-and-Classification/data/drone_RF_data/"},
+        # {"id": "shard0", "type": "shard", "loop": True, "sleep_s": 0.1,
+        #  "path": "/home/ghoth/thesis_drone_detection/Robust-Drone-Detection-and-Classification/data/drone_RF_shards/"},
+        # {"id": "hackrf0", "type": "hackrf", "center_freq_hz": 2_440_000_000,
+        #  "sample_rate_hz": 20_000_000, "gain_db": 30},
+        # {"id": "scan0", "type": "hackrf_scan", "sample_rate_hz": 20_000_000, "gain_db": 30,
+        #  "bands": [{"name": "2.4G-lo", "center_freq_hz": 2_410_000_000, "dwell_s": 0.5},
+        #            {"name": "2.4G-mid", "center_freq_hz": 2_440_000_000, "dwell_s": 0.5},
+        #            {"name": "2.4G-hi", "center_freq_hz": 2_470_000_000, "dwell_s": 0.5},
+        #            {"name": "5.8G", "center_freq_hz": 5_800_000_000, "dwell_s": 0.5}]},
+    ])
+
+    # Capture → inference chunk ring (one per source). Must exceed max_batch_size:
+    # the batch being inferred holds its slots, the rest keep capturing meanwhile
+    ring_capacity: int = 8
+    overflow_policy: str = "drop_oldest"   # block | drop_oldest | drop_newest
+
+    # Streaming mode: rolling STFT, classify a sliding window every stride
+    stream_mode: bool = False
+    stream_window_frames: int | None = None   # None = iq_len // hop_length, the trained input width
+    stream_stride_frames: int = 512
+
+    # Progressive (anytime) mode, chunk mode only: sources deliver each chunk in pieces
+    # ending on every progressive_fractions step (a quarter of iq_len by default), and
+    # the chunk's spectrogram is built up per source as they arrive. Each step's prefix
+    # is classified as soon as its samples are in and published as provisional, raising
+    # a detection above progressive_threshold (also set through /settings); the whole
+    # chunk gives the final one. Costs up to sum(fractions) forward passes per chunk,
+    # steps are skipped while the consumer is behind; ring_capacity counts pieces.
+    # Works best with a model trained on short windows (iq_window in train_model_cv5.py).
+    progressive_mode: bool = False
+    progressive_fractions: tuple = (0.25, 0.5, 1.0)
+    progressive_threshold: float = 0.95
+
+    # /stream push (Server-Sent Events): frames buffered per client before the oldest is dropped
+    sse_queue_len: int = 16
+    sse_keepalive_s: float = 15.0
+
+    # Noise gate: chunks whose spectrogram looks like empty air (no strong bin, few
+    # hot cells) are reported as Noise without running the model. Off until the
+    # thresholds are calibrated on your capture chain (check_gate.py).
+    gate_enabled: bool = False
+    gate_max_excess_db: float = 6.0       # strongest bin's mean power over the median bin
+    gate_max_occupancy: float = 0.02      # fraction of cells above gate_occupancy_k x floor
+    gate_occupancy_k: float = 6.0       # Gaussian noise: ~0.25% of cells above 6x the floor
+    gate_audit_rate: float = 0.02         # gated chunks still run through the model to count misses
+
+    # On-demand profiler captures (POST /profile) are written here
+    profile_dir: str = "profiles"
+
+    # Detection history (SQLite, WAL); writes are batched every event_flush_s
+    event_db_path: str = "data/events.db"
+    event_flush_s: float = 0.5
+
+    # Recent log lines kept in memory for /logs (older history: /logs?source=file)
+    log_ring_lines: int = 2000
+    # Logger level: INFO skips the per-chunk DEBUG records entirely
+    log_level: str = "DEBUG"
+    # Log file format: text | jsonl (one compact JSON object per line; console stays text)
+    log_format: str = "text"
 
 CFG = Config()
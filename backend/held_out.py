@@ -0,0 +1,73 @@
+# Held-out evaluation set for the check_*.py scripts: the test split that
+# train_model_cv5.py kept away from a checkpoint during training, and the
+# scaffolding those scripts share to turn it into model inputs.
+import os
+import pickle
+import re
+import torch
+
+from config import CFG
+from pipeline import TransformSpectrogram
+
+N_EVAL = 200                        # held-out samples per check
+DEVICE = torch.device("cpu")
+
+def results_path(checkpoint_path):
+    """results_fold<k>.pkl that train_model_cv5.py writes next to best_model_fold<k>.pth"""
+    folder, name = os.path.split(checkpoint_path)
+    m = re.search(r"fold(\d+)", name)
+    if m is None:
+        raise ValueError(f"Can't tell the fold of checkpoint {checkpoint_path}")
+    return os.path.join(folder, f"results_fold{m.group(1)}.pkl")
+
+def dataset_files(data_dir):
+    """The file list drone_data_dataset indexes (same listdir order and filters)."""
+    files = [f for f in os.listdir(data_dir) if f.endswith("pt")]
+    return [f for f in files if f.startswith("IQdata_sample")]
+
+def test_files(checkpoint_path, data_dir):
+    """Names of the test split files of the checkpoint's training run."""
+    path = results_path(checkpoint_path)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"{path} not found: needed to know which samples {checkpoint_path} was not trained on")
+    with open(path, "rb") as f:
+        results = pickle.load(f)
+    if "test_files" in results:
+        return set(results["test_files"])
+    # older runs only saved indices into the dataset's (unsorted) listdir order,
+    # valid as long as data_dir holds the same files as when training
+    files = dataset_files(data_dir)
+    return {files[i] for i in results["test_idx"]}
+
+def held_out_files(data_dir, checkpoint_paths, limit=None, exclude=()):
+    """
+    Sorted paths of the .pt files that none of checkpoint_paths was trained on
+    (the intersection of their test splits), minus `exclude` file names.
+    No checkpoints, no held-out set: returns [].
+    """
+    if not checkpoint_paths:
+        return []
+    names = None
+    for checkpoint_path in checkpoint_paths:
+        split = test_files(checkpoint_path, data_dir)
+        names = split if names is None else names & split
+    names = sorted(names - set(exclude))[:limit]
+    return [os.path.join(data_dir, f) for f in names]
+
+def held_out_set(checkpoint_paths, exclude=()):
+    """held_out_files() of CFG.calib_dir for a check script: at most N_EVAL files, announced on stdout."""
+    files = held_out_files(CFG.calib_dir, checkpoint_paths, limit=N_EVAL, exclude=exclude)
+    if checkpoint_paths:
+        print(f"Held-out set: {len(files)} samples from {CFG.calib_dir}")
+    return files
+
+def check_transform(freq_bins):
+    """The serving transform (CFG STFT parameters) on DEVICE, cropped to freq_bins."""
+    return TransformSpectrogram(DEVICE, CFG.n_fft, CFG.win_length, CFG.hop_length, freq_bins=freq_bins)
+
+def held_out_inputs(transform, files, iq_len):
+    """Yields (x, y, snr) per file: the (1, 2, F, T) spectrogram of its first iq_len samples, target and SNR."""
+    for f in files:
+        data = torch.load(f, map_location="cpu")
+        x = transform(data["x_iq"][..., :iq_len].float()).unsqueeze(0)
+        yield x, int(data["y"]), int(data.get("snr", 0))
@@ -0,0 +1,140 @@
+import itertools
+import json
+import logging
+import logging.handlers
+import os
+from collections import deque
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that enqueues the record untouched. The stock prepare()
+    formats the message in the logging thread; here the QueueListener
+    thread does it, so the caller only pays for building the LogRecord.
+    (In-process queue only: records are not pickled.)
+    """
+    def prepare(self, record):
+        return record
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """One compact JSON object per line: ts, level, logger, func, line, msg (+ exc)."""
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "func": record.funcName,
+            "line": record.lineno,
+            "msg": record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, separators=(",", ":"), default=str)
+
+
+class RingLogHandler(logging.Handler):
+    """
+    Keeps the last `capacity` records in memory, each tagged with a
+    monotonically increasing sequence number (the /logs cursor).
+    Records are formatted when read, not when logged.
+    """
+    def __init__(self, capacity=2000, level=logging.NOTSET):
+        super().__init__(level)
+        self.records = deque(maxlen=capacity)
+        self.seq = 0
+
+    def emit(self, record):
+        # Handler.handle() already holds self.lock around emit()
+        if record.exc_info:
+            # render the traceback now (cached in exc_text) so we don't keep its frames alive
+            record.exc_text = record.exc_text or logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        self.seq += 1
+        self.records.append((self.seq, record))
+
+    def lines(self, n=80, min_level=logging.NOTSET, since=0):
+        """
+        Lines at or above `min_level`, oldest first.
+        since=0:   the newest `n`, walking back from the newest record (cost ~ O(n)).
+        since=seq: the oldest `n` with seq > `since`, so a client polling with the
+                   cursor gets every line once; when more are waiting, the next
+                   call continues from the returned cursor.
+        returns (lines, cursor, missed): cursor is the seq to pass as `since` next
+        time, missed the number of records after `since` already evicted from the ring
+        """
+        picked = []
+        with self.lock:
+            if not since:
+                cursor = self.seq
+                for seq, record in reversed(self.records):
+                    if len(picked) >= n:
+                        break
+                    if record.levelno >= min_level:
+                        picked.append(record)
+                picked.reverse()
+                missed = 0
+            else:
+                since = min(since, self.seq)    # a cursor from before a restart
+                # seqs are consecutive, so the first record after `since` is found by position
+                oldest = self.records[0][0] if self.records else self.seq + 1
+                missed = max(0, oldest - since - 1)
+                cursor = max(since, oldest - 1)
+                for seq, record in itertools.islice(self.records, max(0, since + 1 - oldest), None):
+                    if len(picked) >= n:
+                        break
+                    cursor = seq
+                    if record.levelno >= min_level:
+                        picked.append(record)
+        return [self.format(r) for r in picked], cursor, missed
+
+
+def _reverse_lines(path, block_size=64 * 1024):
+    """Yields the lines of a text file last-first, reading fixed-size blocks from the end."""
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        tail = b""
+        while pos > 0:
+            step = min(block_size, pos)
+            pos -= step
+            f.seek(pos)
+            block = f.read(step) + tail
+            parts = block.split(b"\n")
+            tail = parts[0]                # may continue in the previous block
+            for line in reversed(parts[1:]):
+                if line:
+                    yield line.decode("utf-8", errors="ignore")
+        if tail:
+            yield tail.decode("utf-8", errors="ignore")
+
+
+def _line_level(line):
+    if line.startswith("{"):
+        # JSON-lines file (CFG.log_format = "jsonl")
+        try:
+            return logging.getLevelName(json.loads(line).get("level"))
+        except ValueError:
+            return None
+    # "2025-01-01 12:00:00 | INFO     | drone_rf_backend:..." (see the formatter in app.py)
+    parts = line.split(" | ", 2)
+    if len(parts) < 3:
+        return None
+    return logging.getLevelName(parts[1].strip())
+
+
+def tail_file(path, n=80, min_level=logging.NOTSET):
+    """Last `n` lines of a log file at or above `min_level`, oldest first, without reading the whole file."""
+    out = []
+    for line in _reverse_lines(path):
+        if len(out) >= n:
+            break
+        if min_level > logging.NOTSET:
+            level = _line_level(line)
+            if not isinstance(level, int) or level < min_level:
+                continue    # continuation lines (tracebacks) carry no level
+        out.append(line)
+    out.reverse()
+    return out
@@ -0,0 +1,117 @@
+import threading
+from bisect import bisect_left
+
+# Upper bounds in seconds: 0.1 ms .. ~26 s, doubling (+Inf is implicit)
+LATENCY_BUCKETS = tuple(0.0001 * 2 ** k for k in range(19))
+
+class Histogram:
+    """Cumulative bucket histogram (Prometheus-style) with quantile estimates from the buckets."""
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.bounds = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, seconds):
+        i = bisect_left(self.bounds, seconds)
+        with self.lock:
+            self.counts[i] += 1
+            self.sum += seconds
+            self.count += 1
+
+    def quantile(self, q):
+        """Linear interpolation inside the bucket holding the q-th observation."""
+        with self.lock:
+            counts, total = list(self.counts), self.count
+        if total == 0:
+            return None
+        rank = q * total
+        seen = 0
+        for i, c in enumerate(counts):
+            if c and seen + c >= rank:
+                lo = self.bounds[i - 1] if i > 0 else 0.0
+                if i == len(self.bounds):
+                    return lo                    # +Inf bucket: best we know is its lower bound
+                return lo + (self.bounds[i] - lo) * (rank - seen) / c
+            seen += c
+        return self.bounds[-1]
+
+class PipelineMetrics:
+    """
+    Per-stage latency histograms and event counters for the live pipeline,
+    plus gauges read on demand. Rendered as Prometheus text by /metrics.
+    """
+    # first_detection: start of a chunk's capture to its first detected result (provisional or final)
+    STAGES = ("read", "queue", "transform", "gate", "model", "postprocess", "store", "total", "first_detection")
+    QUANTILES = (0.5, 0.95, 0.99)
+
+    def __init__(self, prefix="drone_rf"):
+        self.prefix = prefix
+        self.stages = {s: Histogram() for s in self.STAGES}
+        self.counters = {}
+        self.gauges = {}        # name -> (help, callable, label): number, {label value: number} or None
+        self.lock = threading.Lock()
+
+    def observe(self, stage, seconds):
+        self.stages[stage].observe(seconds)
+
+    def inc(self, name, n=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def gauge(self, name, help_text, fn, label=None):
+        """fn() returns a number, or with `label` a {label value: number} dict (None = skip)."""
+        self.gauges[name] = (help_text, fn, label)
+
+    def summary(self):
+        """Milliseconds per stage: count, mean, p50/p95/p99 (for /stats and logs)."""
+        out = {}
+        for stage, h in self.stages.items():
+            if h.count == 0:
+                continue
+            out[stage] = {
+                "count": h.count,
+                "mean_ms": h.sum / h.count * 1000.0,
+                **{f"p{int(q * 100)}_ms": h.quantile(q) * 1000.0 for q in self.QUANTILES},
+            }
+        return out
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        p = self.prefix
+        lines = [
+            f"# HELP {p}_stage_seconds Pipeline stage latency",
+            f"# TYPE {p}_stage_seconds histogram",
+        ]
+        for stage, h in self.stages.items():
+            with h.lock:
+                counts, total, hsum = list(h.counts), h.count, h.sum
+            cum = 0
+            for bound, c in zip(h.bounds, counts):
+                cum += c
+                lines.append(f'{p}_stage_seconds_bucket{{stage="{stage}",le="{bound:g}"}} {cum}')
+            lines.append(f'{p}_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {total}')
+            lines.append(f'{p}_stage_seconds_sum{{stage="{stage}"}} {hsum:.6f}')
+            lines.append(f'{p}_stage_seconds_count{{stage="{stage}"}} {total}')
+
+        with self.lock:
+            counters = dict(self.counters)
+        for name, value in sorted(counters.items()):
+            lines.append(f"# TYPE {p}_{name}_total counter")
+            lines.append(f"{p}_{name}_total {value}")
+
+        for name, (help_text, fn, label) in self.gauges.items():
+            value = fn()
+            if value is None:
+                continue
+            lines.append(f"# HELP {p}_{name} {help_text}")
+            lines.append(f"# TYPE {p}_{name} gauge")
+            if label is None:
+                lines.append(f"{p}_{name} {float(value):g}")
+            else:
+                for key, v in value.items():
+                    lines.append(f'{p}_{name}{{{label}="{key}"}} {float(v):g}')
+        return "\n".join(lines) + "\n"
+
+METRICS = PipelineMetrics()
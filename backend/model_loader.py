@@ -1,22 +1,209 @@
+import copy
+import hashlib
+import json
+import os
 import torch
 import sys
-import os
 
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "/home/ghoth/thesis_drone_detection/Robust-Drone-Detection-and-Classification/"))
 sys.path.append(PROJECT_ROOT)
 
 import lib.model_VGG2D
 
+import logging
+logger = logging.getLogger("drone_rf_backend")
+
+PRECISIONS = ("fp32", "bf16", "int8_dynamic", "int8_static")
+
 def get_model(model_name: str, num_classes: int):
     if model_name == "vgg11_bn":
         return lib.model_VGG2D.vgg11_bn(num_classes=num_classes)
+    if model_name == "vgg11_bn_slim":
+        return lib.model_VGG2D.vgg11_bn_slim(num_classes=num_classes)
     if model_name == "vgg11":
         return lib.model_VGG2D.vgg11(num_classes=num_classes)
     raise ValueError(f"Unsupported model_name={model_name}")
 
-def load_model(best_model_path: str, model_name: str, num_classes: int, device: torch.device):
+class AutocastModel(torch.nn.Module):
+    """Runs the wrapped model under autocast and hands back fp32 logits."""
+    def __init__(self, model, device, dtype=torch.bfloat16):
+        super().__init__()
+        self.model = model
+        self.device_type = device.type
+        self.dtype = dtype
+
+    def forward(self, x):
+        with torch.autocast(device_type=self.device_type, dtype=self.dtype):
+            return self.model(x).float()
+
+def load_calibration_inputs(pt_dir, transform, n_samples, device, iq_len=None):
+    """Spectrograms (1, 2, F, T) of the first n_samples .pt files in pt_dir (first iq_len samples of each)."""
+    files = sorted(f for f in os.listdir(pt_dir) if f.endswith(".pt"))[:n_samples]
+    if not files:
+        raise FileNotFoundError(f"No .pt files found in {pt_dir}")
+    inputs = []
+    with torch.no_grad():
+        for f in files:
+            data = torch.load(os.path.join(pt_dir, f), map_location="cpu")
+            inputs.append(transform(data["x_iq"][..., :iq_len].float().to(device)).unsqueeze(0))
+    return inputs
+
+def quantize_model(model, precision, calib_inputs=None):
+    """
+    int8_dynamic: int8 weights / dynamic activations for the Linear classifier
+    int8_static:  int8 conv stack (BN/ReLU fused), activation ranges calibrated
+                  on calib_inputs; the small classifier stays fp32
+    Quantized kernels are CPU only.
+    """
+    model = copy.deepcopy(model).cpu().eval()
+    if precision == "int8_dynamic":
+        return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    if precision == "int8_static":
+        from torch.ao.quantization import get_default_qconfig_mapping
+        from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+        if not calib_inputs:
+            raise ValueError("int8_static needs calibration inputs")
+        qconfig_mapping = get_default_qconfig_mapping("x86").set_module_name("classifier", None)
+        prepared = prepare_fx(model, qconfig_mapping, example_inputs=(calib_inputs[0].cpu(),))
+        with torch.no_grad():
+            for x in calib_inputs:
+                prepared(x.cpu())
+        return convert_fx(prepared)
+
+    raise ValueError(f"Unsupported quantization precision={precision}")
+
+def apply_precision(model, precision, device, calib_inputs=None):
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unsupported precision={precision}")
+    if precision == "fp32":
+        return model
+    if precision == "bf16":
+        return AutocastModel(model, device, torch.bfloat16)
+    if device.type != "cpu":
+        raise ValueError(f"precision={precision} is only supported on CPU, got device={device}")
+    return quantize_model(model, precision, calib_inputs)
+
+def load_model(best_model_path: str, model_name: str, num_classes: int, device: torch.device,
+               precision: str = "fp32", calib_inputs=None, fold_bn: bool = True):
     ckpt = torch.load(best_model_path, map_location=device)
     model = get_model(model_name, num_classes).to(device)
     model.load_state_dict(ckpt["model_state_dict"])
     model.eval()
+    if fold_bn:
+        lib.model_VGG2D.fold_batchnorm(model)
+    if precision != "fp32":
+        model = apply_precision(model, precision, device, calib_inputs)
+        logger.info(f"Model precision: {precision}")
     return model
+
+def file_sha256(path, block_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def artifact_path(artifact_dir, best_model_path, model_name, input_shape, device, precision, fold_bn, ext=".pt",
+                  calib_key=None):
+    """
+    Artifact file name keyed by checkpoint hash, model, input shape, torch version and load options.
+    calib_key (e.g. calibration dir and sample count) is part of the key for int8_static only.
+    """
+    key = {
+        "format": ext,
+        "checkpoint_sha256": file_sha256(best_model_path),
+        "model_name": model_name,
+        "input_shape": list(input_shape),
+        "torch": torch.__version__,
+        "device": device.type,
+        "precision": precision,
+        "fold_bn": fold_bn,
+    }
+    if precision == "int8_static":
+        key["calibration"] = calib_key
+    digest = hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()[:16]
+    return os.path.join(artifact_dir, f"{model_name}_{precision}_{digest}{ext}")
+
+def optimize_scripted(scripted):
+    """Freezes weights into the graph and applies inference passes (e.g. Conv+ReLU fusion)."""
+    frozen = torch.jit.freeze(scripted.eval())
+    try:
+        return torch.jit.optimize_for_inference(frozen)
+    except Exception:
+        logger.warning("optimize_for_inference failed, using the frozen model", exc_info=True)
+        return frozen
+
+def load_compiled_model(best_model_path: str, model_name: str, num_classes: int, device: torch.device,
+                        input_shape, artifact_dir: str, precision: str = "fp32", calib_inputs_fn=None,
+                        fold_bn: bool = True, calib_key=None):
+    """
+    Loads the TorchScript artifact for this checkpoint/model/shape/torch version
+    from artifact_dir, or builds it (load_model + trace) and stores it there.
+    The traced module is saved un-frozen and frozen after loading, which is
+    cheap and keeps artifacts loadable across builds of the same torch version.
+    calib_inputs_fn is only called (for int8_static) when the artifact has to be built;
+    calib_key identifies its calibration set, so a changed set rebuilds the artifact.
+    Falls back to the eager model if tracing is not possible.
+    returns (model, artifact path or None)
+    """
+    path = artifact_path(artifact_dir, best_model_path, model_name, input_shape, device, precision, fold_bn,
+                         calib_key=calib_key)
+    if os.path.exists(path):
+        try:
+            scripted = torch.jit.load(path, map_location=device)
+            logger.info(f"Loaded compiled model artifact {path}")
+            return optimize_scripted(scripted), path
+        except Exception:
+            logger.warning(f"Could not load artifact {path}, rebuilding", exc_info=True)
+
+    calib_inputs = calib_inputs_fn() if (precision == "int8_static" and calib_inputs_fn) else None
+    model = load_model(best_model_path, model_name, num_classes, device,
+                       precision=precision, calib_inputs=calib_inputs, fold_bn=fold_bn)
+    example = torch.zeros(input_shape, device=device)
+    try:
+        with torch.no_grad():
+            scripted = torch.jit.trace(model, example)
+        os.makedirs(artifact_dir, exist_ok=True)
+        tmp_path = path + ".tmp"
+        torch.jit.save(scripted, tmp_path)
+        os.replace(tmp_path, path)
+        logger.info(f"Saved compiled model artifact {path}")
+        return optimize_scripted(scripted), path
+    except Exception:
+        logger.warning("Model tracing failed, using the eager model", exc_info=True)
+        return model, None
+
+def load_onnx_model(best_model_path: str, model_name: str, num_classes: int, input_shape, artifact_dir: str,
+                    intra_op_threads: int = 0, parity_atol: float = 1e-3, fold_bn: bool = True):
+    """
+    ONNX Runtime (CPU) engine: exports the fp32 model to artifact_dir once per
+    checkpoint/model/shape/torch version, checks its outputs against PyTorch
+    on a random input and returns an OnnxModel that is called like the torch model.
+    Raises RuntimeError if the exported model does not match PyTorch.
+    returns (model, onnx path)
+    """
+    from onnx_engine import OnnxModel, export_onnx, check_parity  # optional dependency
+
+    device = torch.device("cpu")
+    path = artifact_path(artifact_dir, best_model_path, model_name, input_shape, device, "fp32", fold_bn, ext=".onnx")
+    if os.path.exists(path):
+        logger.info(f"Loaded ONNX model {path}")
+        return OnnxModel(path, intra_op_threads), path
+
+    model = load_model(best_model_path, model_name, num_classes, device, fold_bn=fold_bn)
+    os.makedirs(artifact_dir, exist_ok=True)
+    tmp_path = path + ".tmp"
+    export_onnx(model, tmp_path, input_shape)
+    onnx_model = OnnxModel(tmp_path, intra_op_threads)
+
+    x = torch.randn(input_shape)
+    ok, max_abs_diff = check_parity(model, onnx_model, x, atol=parity_atol)
+    if not ok:
+        os.remove(tmp_path)
+        raise RuntimeError(f"ONNX parity check failed: max |Δlogit| = {max_abs_diff:.2e} (atol={parity_atol})")
+    logger.info(f"ONNX parity check passed: max |Δlogit| = {max_abs_diff:.2e}")
+
+    os.replace(tmp_path, path)
+    logger.info(f"Saved ONNX model {path}")
+    return OnnxModel(path, intra_op_threads), path
@@ -0,0 +1,55 @@
+# onnx_engine.py - ONNX Runtime CPU execution path for the VGG models
+import numpy as np
+import torch
+import onnxruntime as ort  # pip install onnxruntime
+
+import logging
+logger = logging.getLogger("drone_rf_backend")
+
+def export_onnx(model, path, input_shape, opset=18):
+    """Exports a (B, 2, F, T) -> (B, num_classes) model with a dynamic batch axis."""
+    example = torch.zeros(input_shape)
+    torch.onnx.export(
+        model.cpu().eval(),
+        (example,),
+        path,
+        input_names=["spectrogram"],
+        output_names=["logits"],
+        dynamic_axes={"spectrogram": {0: "batch"}, "logits": {0: "batch"}},
+        opset_version=opset,
+    )
+
+class OnnxModel:
+    """
+    ONNX Runtime session behind the same call interface as the torch model:
+    (B, 2, F, T) float tensor in, (B, num_classes) logits tensor out.
+    """
+    def __init__(self, path, intra_op_threads=0, inter_op_threads=1):
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        opts.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        opts.intra_op_num_threads = intra_op_threads    # 0 = one per physical core
+        opts.inter_op_num_threads = inter_op_threads
+        self.path = path
+        self.session = ort.InferenceSession(path, opts, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, x):
+        x = np.ascontiguousarray(x.detach().cpu().numpy(), dtype=np.float32)
+        logits = self.session.run(None, {self.input_name: x})[0]
+        return torch.from_numpy(logits)
+
+    def eval(self):
+        return self
+
+def check_parity(torch_model, onnx_model, x, atol=1e-3):
+    """
+    Compares logits of both engines on x.
+    returns (ok, max_abs_diff); ok needs matching argmax and diff <= atol
+    """
+    with torch.no_grad():
+        ref = torch_model(x).float().cpu()
+    out = onnx_model(x)
+    max_abs_diff = float((ref - out).abs().max())
+    same_argmax = bool((ref.argmax(dim=1) == out.argmax(dim=1)).all())
+    return same_argmax and max_abs_diff <= atol, max_abs_diff
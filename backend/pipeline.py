@@ -1,54 +1,598 @@
+import os
+import random
+import sys
+import threading
 import time
 import numpy as np
 import torch
-from torchaudio.transforms import Spectrogram
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "/home/ghoth/thesis_drone_detection/Robust-Drone-Detection-and-Classification/"))
+sys.path.append(PROJECT_ROOT)
+
+from lib.freq_band import band_index    # the training crop (train_model_cv5.py freq_bins)
+from metrics import Histogram
 
 import logging
 logger = logging.getLogger("drone_rf_backend")
 
+def dc_row(n_fft, freq_bins=None):
+    """Spectrogram row of the DC bin: 0 in FFT order, the centre of a cropped band, None if cropped away."""
+    if freq_bins is None:
+        return 0
+    lo, hi = freq_bins
+    return n_fft // 2 - lo if lo <= n_fft // 2 < hi else None
+
 class TransformSpectrogram(torch.nn.Module):
-    def __init__(self, device, n_fft, win_length, hop_length):
+    """
+    IQ → (2, F, T) spectrogram (real/imag channels), same output as the
+    training transform (torchaudio Spectrogram, center=False, onesided=False,
+    divided by win_length).
+
+    With hop_length == win_length == n_fft the STFT is just non-overlapping
+    frames, so a fast path reshapes the samples into frames, applies the Hann
+    window (with the 1/win_length scaling folded in) and runs one batched FFT
+    in preallocated buffers, writing the (2, F, T) layout directly.
+    Other parameter sets fall back to torchaudio.
+
+    reuse_output=True also returns a preallocated output buffer, which the
+    next call overwrites; only use it when the spectrogram is consumed
+    before the next call (the inference hot path). Buffers hold
+    max_batch_size chunks, smaller batches use views of them.
+
+    freq_bins=(lo, hi) keeps only that sub-band (see band_index), F = hi - lo,
+    for models trained on a cropped band.
+    """
+    def __init__(self, device, n_fft, win_length, hop_length, reuse_output=False, freq_bins=None, max_batch_size=1):
         super().__init__()
-        self.spec = Spectrogram(
-            n_fft=n_fft,
-            win_length=win_length,
-            hop_length=hop_length,
-            window_fn=torch.hann_window,
-            power=None,
-            normalized=False,
-            center=False,
-            onesided=False
-        ).to(device)
+        self.n_fft = n_fft
         self.win_length = win_length
+        self.hop_length = hop_length
+        self.reuse_output = reuse_output
+        self.max_batch_size = max_batch_size
+        self.fast = n_fft == win_length == hop_length
+        self.buffers = {}
+        self.band = None if freq_bins is None else band_index(n_fft, freq_bins, device)
+        self.n_bins = n_fft if freq_bins is None else freq_bins[1] - freq_bins[0]
+
+        if self.fast:
+            self.register_buffer("window", torch.hann_window(win_length, device=device) / win_length)
+        else:
+            from torchaudio.transforms import Spectrogram  # heavy import, only needed for overlapping frames
+            self.spec = Spectrogram(
+                n_fft=n_fft,
+                win_length=win_length,
+                hop_length=hop_length,
+                window_fn=torch.hann_window,
+                power=None,
+                normalized=False,
+                center=False,
+                onesided=False
+            ).to(device)
+
+    def _buffer(self, name, shape, dtype, device):
+        """
+        First shape[0] rows of the preallocated buffer `name`. One buffer per
+        name, sized for max_batch_size chunks; smaller batches use a view of
+        it, a larger batch or another chunk shape reallocates it.
+        """
+        B, item = shape[0], tuple(shape[1:])
+        buf = self.buffers.get(name)
+        if buf is None or buf.shape[0] < B or buf.shape[1:] != item or buf.dtype != dtype or buf.device != device:
+            buf = self.buffers[name] = torch.empty((max(B, self.max_batch_size), *item), dtype=dtype, device=device)
+        return buf[:B]
+
+    def _framed_fft(self, iq_signal):
+        n = self.n_fft
+        complex_in = iq_signal.is_complex()
+        if iq_signal.dim() == (1 if complex_in else 2):
+            return self._framed_fft(iq_signal.unsqueeze(0))[0]
+        B = iq_signal.shape[0]
+        T = iq_signal.shape[-1] // n        # trailing partial frame is dropped, as in torch.stft
+        dev = iq_signal.device
+
+        frames = self._buffer("frames", (B, T, n), torch.complex64, dev)
+        if complex_in:
+            torch.mul(iq_signal[..., :T * n].reshape(B, T, n), self.window, out=frames)
+        else:
+            # interleave I/Q straight into the complex frame buffer, then window in place
+            frames_ri = torch.view_as_real(frames)
+            frames_ri[..., 0].copy_(iq_signal[:, 0, :T * n].reshape(B, T, n))
+            frames_ri[..., 1].copy_(iq_signal[:, 1, :T * n].reshape(B, T, n))
+            frames.mul_(self.window)
+
+        spec = torch.fft.fft(frames, dim=-1, out=frames)    # in place, the windowed frames aren't needed after
+        F = self.n_bins
+        if self.band is not None:
+            band = self._buffer("band", (B, T, F), torch.complex64, dev)
+            torch.index_select(spec, -1, self.band, out=band)
+            spec = band
+
+        # (T, F) → (F, T): transpose whole complex values, moved bit-exact as
+        # 8-byte words (much cheaper than two strided float transposes)
+        spec_ft = self._buffer("spec_ft", (B, F, T), torch.complex64, dev)
+        spec_ft.view(torch.int64).copy_(spec.view(torch.int64).transpose(-1, -2))
+
+        if self.reuse_output:
+            out = self._buffer("out", (B, 2, F, T), torch.float32, dev)
+        else:
+            out = torch.empty((B, 2, F, T), dtype=torch.float32, device=dev)
+        out[:, 0].copy_(spec_ft.real)
+        out[:, 1].copy_(spec_ft.imag)
+        return out
 
     def forward(self, iq_signal: torch.Tensor) -> torch.Tensor:
-        # iq_signal: (2, N)
-        iq_complex = iq_signal[0, :] + (1j * iq_signal[1, :])
+        # iq_signal: complex (N,) / (B, N), or real (2, N) / (B, 2, N)
+        if self.fast:
+            return self._framed_fft(iq_signal)
+        if iq_signal.is_complex():
+            iq_complex = iq_signal
+        else:
+            iq_complex = iq_signal[..., 0, :] + (1j * iq_signal[..., 1, :])
         spec = self.spec(iq_complex)          # complex STFT
-        spec = torch.view_as_real(spec)       # (..., 2)
-        spec = torch.moveaxis(spec, 2, 0)     # (2, F, T)
+        if self.band is not None:
+            spec = spec.index_select(-2, self.band)
+        spec = torch.view_as_real(spec)       # (..., F, T, 2)
+        spec = torch.moveaxis(spec, -1, -3)   # (..., 2, F, T)
         spec = spec / self.win_length
         return spec
 
+class NoiseGate:
+    """
+    Cheap empty-air test on the spectrogram, run before the model.
+
+    Per chunk: the mean power of each frequency bin over time (band profile),
+    its median as the noise floor, then
+      excess_db - strongest bin above the floor (narrow-band emitters)
+      occupancy - fraction of time-frequency cells above occupancy_k x floor
+                  (bursty / hopping links)
+    dc_row is the spectrogram row of the DC bin (0 unless the band is cropped,
+    None if it is cropped away); LO leakage puts a spike there on every chunk,
+    so it is left out of excess_db.
+    A chunk with both under their limits is reported as noise without running
+    the model. audit_rate of those still go through the model; each one the
+    model classifies as not-noise is counted (and logged) as a missed detection.
+    """
+    def __init__(self, num_classes, noise_index, max_excess_db=6.0, max_occupancy=0.02, occupancy_k=6.0,
+                 audit_rate=0.02, dc_row=0, seed=0):
+        self.num_classes = num_classes
+        self.noise_index = noise_index
+        self.max_excess_db = max_excess_db
+        self.max_occupancy = max_occupancy
+        self.occupancy_k = occupancy_k
+        self.audit_rate = audit_rate
+        self.dc_row = dc_row
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.chunks = 0
+        self.gated = 0
+        self.audited = 0
+        self.audit_misses = 0
+
+    def measure(self, x):
+        """x: (B, 2, F, T) spectrogram. returns (excess_db, occupancy), each (B,)"""
+        power = x[:, 0].square() + x[:, 1].square()                  # (B, F, T)
+        profile = power.mean(dim=-1)                                  # (B, F)
+        floor = profile.median(dim=-1).values.clamp_min(1e-20)        # (B,)
+        peak = profile
+        if self.dc_row is not None:
+            peak = profile.clone()
+            peak[:, self.dc_row] = 0.0
+        excess_db = 10.0 * torch.log10(peak.amax(dim=-1) / floor)
+        occupancy = (power > self.occupancy_k * floor[:, None, None]).count_nonzero(dim=(1, 2))
+        occupancy = occupancy / float(power.shape[1] * power.shape[2])
+        return excess_db, occupancy
+
+    def decide(self, x):
+        """returns one dict per chunk: excess_db, occupancy, gated, audit"""
+        excess_db, occupancy = self.measure(x)
+        out = []
+        with self.lock:
+            for e, o in zip(excess_db.tolist(), occupancy.tolist()):
+                gated = e < self.max_excess_db and o < self.max_occupancy
+                audit = gated and self.rng.random() < self.audit_rate
+                self.chunks += 1
+                self.gated += gated
+                self.audited += audit
+                out.append({"excess_db": e, "occupancy": o, "gated": gated, "audit": audit})
+        return out
+
+    def check_audit(self, info, result):
+        if info["audit"] and result["pred"] != self.noise_index:
+            with self.lock:
+                self.audit_misses += 1
+            logger.warning(
+                "Noise gate audit miss | pred=%d conf=%.3f | excess=%.1f dB occupancy=%.4f",
+                result["pred"], result["confidence"], info["excess_db"], info["occupancy"],
+            )
+
+    def stats(self):
+        with self.lock:
+            return {
+                "chunks": self.chunks,
+                "gated": self.gated,
+                "hit_rate": self.gated / self.chunks if self.chunks else 0.0,
+                "audited": self.audited,
+                "audit_misses": self.audit_misses,
+                "audit_miss_rate": self.audit_misses / self.audited if self.audited else 0.0,
+            }
+
+class ModelCascade:
+    """
+    Two-tier classifier behind the same call interface as the torch model:
+    (B, 2, F, T) in, (B, num_classes) logits out.
+
+    The slim model classifies every chunk; chunks whose slim top-1 probability
+    is below `margin` are run again through the heavy model, whose logits
+    replace the slim ones. Both tiers are timed per call, escalations counted.
+    """
+    def __init__(self, slim, heavy, margin=0.9):
+        self.slim = slim
+        self.heavy = heavy
+        self.margin = margin
+        self.lock = threading.Lock()
+        self.tier_latency = {"slim": Histogram(), "heavy": Histogram()}
+        self.chunks = 0
+        self.escalated = 0
+
+    def __call__(self, x):
+        t0 = time.perf_counter()
+        logits = self.slim(x).float()
+        conf = torch.softmax(logits, dim=1).amax(dim=1)
+        escalate = (conf < self.margin).nonzero().flatten()     # waits for the device
+        t1 = time.perf_counter()
+        self.tier_latency["slim"].observe(t1 - t0)
+        if escalate.numel():
+            rows = x if escalate.numel() == x.shape[0] else x[escalate]
+            logits[escalate] = self.heavy(rows).float().to(logits.device)
+            self.tier_latency["heavy"].observe(time.perf_counter() - t1)
+        with self.lock:
+            self.chunks += x.shape[0]
+            self.escalated += escalate.numel()
+        return logits
+
+    def eval(self):
+        return self
+
+    def stats(self):
+        with self.lock:
+            chunks, escalated = self.chunks, self.escalated
+        tiers = {}
+        for tier, h in self.tier_latency.items():
+            if h.count:
+                tiers[tier] = {
+                    "calls": h.count,
+                    "mean_ms": h.sum / h.count * 1000.0,
+                    "p95_ms": h.quantile(0.95) * 1000.0,
+                }
+        return {
+            "margin": self.margin,
+            "chunks": chunks,
+            "escalated": escalated,
+            "escalation_rate": escalated / chunks if chunks else 0.0,
+            "tiers": tiers,
+        }
+
 @torch.no_grad()
 def infer_one(model, transform, iq_2xN, device):
     """
-    iq_2xN: torch.Tensor (2, N) float32 on CPU or GPU
+    iq_2xN: torch.Tensor (2, N) float32 or (N,) complex64 on CPU or GPU
     returns dict with pred, confidence, probs
     """
-    t0 = time.time()
-    spec = transform(iq_2xN.to(device))         # (2, F, T)
-    x = spec.unsqueeze(0)                       # (1, 2, F, T)
-    logits = model(x)
-    probs = torch.softmax(logits, dim=1).squeeze(0).detach().cpu().numpy()
-    pred = int(np.argmax(probs))
-    conf = float(probs[pred])
-    latency_ms = (time.time() - t0) * 1000.0
-    logger.debug(f"Inference | input_shape={list(x.shape)} | output_logits_shape={list(logits.shape)}")
-    return {
-        "pred": pred,
-        "confidence": conf,
-        "probs": probs.tolist(),
-        "latency_ms": latency_ms,
-        "spec_shape": list(spec.shape),
-    }
+    return infer_batch(model, transform, [iq_2xN], device)[0]
+
+@torch.no_grad()
+def infer_batch(model, transform, iq_list, device, timings=None, gate=None):
+    """
+    iq_list: list of complex (N,) or real (2, N) tensors, all with the same shape
+    Stacks the chunks into one (B, 2, F, T) batch and runs the model once.
+    returns one dict per chunk (same keys as infer_one, plus batch_size);
+    latency_ms is the wall time of the batch each chunk was part of
+    timings: optional dict, filled with seconds per stage (transform, gate, model, postprocess)
+    gate: optional NoiseGate; gated chunks skip the model (result has gated=True)
+    """
+    t0 = time.perf_counter()
+    if len(iq_list) == 1:
+        iq = iq_list[0].to(device).unsqueeze(0)           # no stacking copy for a lone chunk
+    else:
+        iq = torch.stack([c.to(device) for c in iq_list]) # (B, N) or (B, 2, N)
+    x = transform(iq)                                     # (B, 2, F, T)
+    if timings is not None:
+        timings["transform"] = time.perf_counter() - t0
+    return _classify(model, x, t0, timings, gate)
+
+@torch.no_grad()
+def infer_spec(model, spec, device, timings=None, gate=None):
+    """
+    spec: (2, F, T) or (B, 2, F, T) spectrogram, e.g. a StreamingSpectrogram window
+    returns one dict per spectrogram (same keys as infer_batch)
+    """
+    t0 = time.perf_counter()
+    x = spec.to(device)
+    if x.dim() == 3:
+        x = x.unsqueeze(0)
+    return _classify(model, x, t0, timings, gate)
+
+def _classify(model, x, t0, timings=None, gate=None):
+    gate_info = None
+    run = x
+    if gate is not None:
+        t_gate = time.perf_counter()
+        gate_info = gate.decide(x)
+        keep = [i for i, g in enumerate(gate_info) if not g["gated"] or g["audit"]]
+        if len(keep) < x.shape[0]:
+            run = x[keep]
+        if timings is not None:
+            timings["gate"] = time.perf_counter() - t_gate
+
+    t_model = time.perf_counter()
+    probs = []
+    if run.shape[0]:
+        logits = model(run)
+        probs = torch.softmax(logits, dim=1).detach().cpu().numpy()   # .cpu() waits for the device
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Inference | input_shape=%s | output_logits_shape=%s", list(run.shape), list(logits.shape))
+    t_post = time.perf_counter()
+    latency_ms = (t_post - t0) * 1000.0
+
+    results = []
+    rows = iter(probs)
+    for i in range(x.shape[0]):
+        info = gate_info[i] if gate_info is not None else None
+        if info is not None and info["gated"] and not info["audit"]:
+            p = np.zeros(gate.num_classes, dtype=np.float32)
+            p[gate.noise_index] = 1.0
+        else:
+            p = next(rows)
+        pred = int(np.argmax(p))
+        results.append({
+            "pred": pred,
+            "confidence": float(p[pred]),
+            "probs": p.tolist(),
+            "latency_ms": latency_ms,
+            "spec_shape": list(x.shape[1:]),
+            "batch_size": x.shape[0],
+        })
+        if info is not None:
+            results[-1]["gate"] = info
+            gate.check_audit(info, results[-1])
+    if timings is not None:
+        if run.shape[0]:
+            timings["model"] = t_post - t_model
+        timings["postprocess"] = time.perf_counter() - t_post
+    return results
+
+class IncrementalSTFT:
+    """
+    Frames and FFTs samples as they arrive, carrying the samples of a partial
+    frame over to the next call. Same frames as TransformSpectrogram on the
+    concatenated samples (Hann window with the 1/win_length scaling, two-sided
+    FFT, freq_bins crop).
+    """
+    def __init__(self, device, n_fft, win_length, hop_length, freq_bins=None):
+        if win_length != n_fft:
+            raise ValueError(f"{type(self).__name__} requires win_length == n_fft")
+        self.device = device
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+
+        # fold the 1/win_length normalisation into the window
+        self.window = torch.hann_window(win_length, device=device) / win_length
+        self.band = None if freq_bins is None else band_index(n_fft, freq_bins, device)
+        self.n_bins = n_fft if freq_bins is None else freq_bins[1] - freq_bins[0]
+        self.pending = torch.empty(0, dtype=torch.complex64, device=device)
+
+    def reset(self):
+        """Forget buffered samples, e.g. after a gap in the stream."""
+        self.pending = torch.empty(0, dtype=torch.complex64, device=self.device)
+
+    def _new_frames(self, iq_signal):
+        """
+        iq_signal: complex (N,) or real (2, N) samples following the previous call
+        returns (k, F) complex spectra of the frames completed by them, or None
+        """
+        iq = iq_signal.to(self.device)
+        if not iq.is_complex():
+            iq = torch.complex(iq[0].float(), iq[1].float())
+        if self.pending.numel():
+            iq = torch.cat((self.pending, iq))
+
+        n_new = 0
+        if iq.shape[0] >= self.n_fft:
+            n_new = 1 + (iq.shape[0] - self.n_fft) // self.hop_length
+        self.pending = iq[n_new * self.hop_length:].clone()
+        if n_new == 0:
+            return None
+
+        frames = iq.unfold(0, self.n_fft, self.hop_length)[:n_new]   # (k, n_fft) view
+        spec_frames = torch.fft.fft(frames * self.window, dim=-1)    # (k, F), new frames only
+        if self.band is not None:
+            spec_frames = spec_frames.index_select(-1, self.band)
+        return spec_frames
+
+class StreamingSpectrogram(IncrementalSTFT):
+    """
+    Rolling STFT over a continuous IQ stream.
+
+    push() frames and FFTs only the newly arrived samples, appends the frames
+    to a rolling buffer and yields a (2, F, window_frames) spectrogram every
+    stride_frames frames once the buffer is full. Output matches
+    TransformSpectrogram on the same window of samples.
+
+    Frames are written twice into a buffer of 2 * window_frames columns, so
+    every window is a contiguous slice and nothing is rolled or concatenated.
+    A yielded window is a view that the next frames overwrite: consume it
+    before advancing the generator. freq_bins crops the band as in
+    TransformSpectrogram.
+    """
+    def __init__(self, device, n_fft, win_length, hop_length, window_frames=2048, stride_frames=512,
+                 freq_bins=None):
+        super().__init__(device, n_fft, win_length, hop_length, freq_bins)
+        self.window_frames = window_frames
+        self.stride_frames = stride_frames
+        self.frames = torch.zeros((2, self.n_bins, 2 * window_frames), device=device)
+        self.reset()
+
+    def reset(self):
+        """Forget buffered samples and frames, e.g. after a gap in the stream."""
+        super().reset()
+        self.n_frames = 0
+        self.next_emit = self.window_frames
+
+    def _write(self, spec_frames):
+        # spec_frames: (k, F) complex, written to columns n_frames .. n_frames + k - 1
+        W = self.window_frames
+        done = 0
+        while done < spec_frames.shape[0]:
+            pos = (self.n_frames + done) % W
+            k = min(spec_frames.shape[0] - done, W - pos)
+            seg = spec_frames[done:done + k].T          # (F, k)
+            for col in (pos, pos + W):
+                self.frames[0, :, col:col + k].copy_(seg.real)
+                self.frames[1, :, col:col + k].copy_(seg.imag)
+            done += k
+
+    @torch.no_grad()
+    def push(self, iq_signal):
+        """
+        iq_signal: complex (N,) or real (2, N) samples following the previous push
+        yields (spec_window, frame_end) where frame_end counts frames since reset
+        """
+        spec_frames = self._new_frames(iq_signal)
+        if spec_frames is None:
+            return
+        n_new = spec_frames.shape[0]
+
+        W = self.window_frames
+        start = 0
+        while start < n_new:
+            k = min(n_new - start, self.next_emit - self.n_frames)
+            self._write(spec_frames[start:start + k])
+            self.n_frames += k
+            start += k
+            if self.n_frames == self.next_emit:
+                pos = self.n_frames % W
+                yield self.frames[:, :, pos:pos + W], self.n_frames
+                self.next_emit += self.stride_frames
+
+class ProgressiveSpectrogram(IncrementalSTFT):
+    """
+    Builds a chunk's (2, F, T) spectrogram from consecutive pieces of it as
+    they are captured, for anytime classification.
+
+    push() frames and FFTs only the new samples; once the frames of the
+    chunk pass the next of `fractions` of T, it returns the prefix
+    (2, F, frames) to classify. After chunk_len samples it returns the whole
+    chunk (frames == chunk_frames, same output as TransformSpectrogram on it)
+    and the next push starts a new chunk. A returned prefix is a view into
+    the chunk buffer: consume it before the next push.
+    """
+    def __init__(self, device, n_fft, win_length, hop_length, chunk_len, fractions=(0.25, 0.5, 1.0),
+                 freq_bins=None):
+        super().__init__(device, n_fft, win_length, hop_length, freq_bins)
+        self.chunk_len = chunk_len
+        self.chunk_frames = T = 1 + (chunk_len - n_fft) // hop_length
+        self.steps = sorted({max(1, min(T, round(T * f))) for f in fractions} - {T})
+        self.frames = torch.zeros((2, self.n_bins, T), device=device)
+        self.reset()
+
+    def reset(self):
+        """Drop the chunk in progress, e.g. after a gap in the stream."""
+        super().reset()
+        self.samples = 0
+        self.n_frames = 0
+        self.next_step = 0
+
+    @torch.no_grad()
+    def push(self, iq_signal):
+        """
+        iq_signal: complex (N,) or real (2, N), the next samples of the chunk
+        returns (spec, frames) when a prefix step or the whole chunk is
+        reached by these samples, else None
+        """
+        if self.samples == self.chunk_len:
+            self.reset()
+        n = iq_signal.shape[-1]
+        if self.samples + n > self.chunk_len:
+            raise ValueError(f"{self.samples} + {n} samples overrun chunk_len={self.chunk_len}")
+        self.samples += n
+
+        spec_frames = self._new_frames(iq_signal)
+        if spec_frames is not None:
+            k = spec_frames.shape[0]
+            seg = spec_frames.T                         # (F, k)
+            self.frames[0, :, self.n_frames:self.n_frames + k].copy_(seg.real)
+            self.frames[1, :, self.n_frames:self.n_frames + k].copy_(seg.imag)
+            self.n_frames += k
+
+        if self.samples == self.chunk_len:
+            return self.frames, self.n_frames
+        reached = self.next_step
+        while self.next_step < len(self.steps) and self.steps[self.next_step] <= self.n_frames:
+            self.next_step += 1
+        if self.next_step == reached:
+            return None
+        return self.frames[:, :, :self.n_frames], self.n_frames
+
+def warmup(model, transform, device, iq_len, batch_sizes=(1,), runs=2):
+    """
+    Runs dummy chunks through transform + model so allocator pools, kernel
+    selection and JIT profiling are done before the first real chunk.
+    """
+    for b in batch_sizes:
+        iq = torch.zeros(iq_len, dtype=torch.complex64, device=device)
+        for _ in range(runs):
+            t0 = time.time()
+            infer_batch(model, transform, [iq] * b, device)
+            logger.info(f"Warm-up | batch={b} | {(time.time() - t0) * 1000.0:.1f} ms")
+
+class BatchCollector:
+    """
+    Gathers pending chunks into micro-batches for infer_batch.
+
+    A batch is closed as soon as it holds max_batch_size chunks, or once
+    max_wait_ms has passed since its first chunk arrived, whichever is first.
+    Chunks are pulled with get(timeout), which returns an (iq, meta,
+    t_enqueued, ...) item or None on timeout.
+    """
+    def __init__(self, max_batch_size, max_wait_ms, get):
+        self.max_batch_size = max_batch_size
+        self.max_wait_s = max_wait_ms / 1000.0
+        self.get = get
+
+    def next_batch(self, timeout=None):
+        """
+        Blocks up to timeout for a first chunk, then keeps collecting until
+        the batch is full or the deadline passes.
+        returns list of (iq, meta, t_enqueued, ...) items (t_enqueued from
+        time.perf_counter); empty on timeout
+        """
+        first = self.get(timeout)
+        if first is None:
+            return []
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait_s
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            item = self.get(remaining)
+            if item is None:
+                break
+            batch.append(item)
+        return batch
+
+    def infer(self, model, transform, batch, device, timings=None, gate=None):
+        """
+        Runs a batch returned by next_batch through the model.
+        returns list of (result, meta); each result's latency_ms covers the
+        time the chunk spent waiting in the queue plus the batch inference
+        """
+        preds = infer_batch(model, transform, [item[0] for item in batch], device, timings, gate)
+        t_done = time.perf_counter()
+        out = []
+        for pred_obj, item in zip(preds, batch):
+            meta, t_enq = item[1], item[2]
+            pred_obj["infer_ms"] = pred_obj["latency_ms"]
+            pred_obj["latency_ms"] = (t_done - t_enq) * 1000.0
+            out.append((pred_obj, meta))
+        return out
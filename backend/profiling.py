@@ -0,0 +1,111 @@
+import os
+import threading
+import time
+
+import torch
+
+from config import CFG
+
+import logging
+logger = logging.getLogger("drone_rf_backend")
+
+class PipelineProfiler:
+    """
+    One-shot profiler capture for the consumer loop.
+
+    arm() asks for the next N chunks to be profiled. The consumer thread calls
+    begin() before each batch and end(n_chunks) after it; while disarmed both
+    return after a single attribute check. When N chunks have been seen the
+    capture stops and its outputs (Chrome trace, operator table, optional
+    pyinstrument report) are written from a separate thread.
+    """
+    def __init__(self, out_dir="profiles"):
+        self.out_dir = out_dir
+        self.armed = False
+        self.lock = threading.Lock()
+        self.status = {"state": "idle"}
+        self._request = None
+        self._t0 = 0.0
+        self._torch_prof = None
+        self._py_prof = None
+        self._chunks = 0
+
+    def arm(self, chunks, python=False, record_shapes=True):
+        with self.lock:
+            if self.status["state"] in ("armed", "running", "writing"):
+                return False
+            self._request = {"chunks": chunks, "python": python, "record_shapes": record_shapes}
+            self.status = {"state": "armed", **self._request}
+            self.armed = True
+        return True
+
+    def begin(self):
+        if not self.armed or self._torch_prof is not None:
+            return
+        req = self._request
+        activities = [torch.profiler.ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(torch.profiler.ProfilerActivity.CUDA)
+        self._torch_prof = torch.profiler.profile(activities=activities, record_shapes=req["record_shapes"])
+        if req["python"]:
+            try:
+                from pyinstrument import Profiler   # optional: pip install pyinstrument
+                self._py_prof = Profiler(interval=0.001)
+                self._py_prof.start()
+            except ImportError:
+                logger.warning("pyinstrument not installed, profiling torch ops only")
+        self._chunks = 0
+        self._t0 = time.time()
+        self._torch_prof.__enter__()
+        self.status = {"state": "running", **req}
+        logger.info(f"Profiler capture started for {req['chunks']} chunks")
+
+    def end(self, n_chunks, final=False):
+        """final=True closes a running capture early (pipeline stopping)."""
+        if self._torch_prof is None:
+            return
+        self._chunks += n_chunks
+        if self._chunks < self._request["chunks"] and not final:
+            return
+        self._torch_prof.__exit__(None, None, None)
+        if self._py_prof is not None:
+            self._py_prof.stop()
+        torch_prof, py_prof = self._torch_prof, self._py_prof
+        self._torch_prof = self._py_prof = None
+        with self.lock:
+            self.armed = False          # back to the single-check fast path right away
+            self.status = {"state": "writing", **self._request}
+        threading.Thread(
+            target=self._write,
+            args=(torch_prof, py_prof, self._request, self._chunks, time.time() - self._t0),
+            daemon=True,
+        ).start()
+
+    def _write(self, torch_prof, py_prof, req, chunks, wall_s):
+        stamp = time.strftime("%Y%m%d_%H%M%S")
+        os.makedirs(self.out_dir, exist_ok=True)
+        files = {}
+        try:
+            files["chrome_trace"] = os.path.join(self.out_dir, f"trace_{stamp}.json")
+            torch_prof.export_chrome_trace(files["chrome_trace"])
+
+            sort_by = "self_cuda_time_total" if torch.cuda.is_available() else "self_cpu_time_total"
+            files["op_table"] = os.path.join(self.out_dir, f"ops_{stamp}.txt")
+            with open(files["op_table"], "w", encoding="utf-8") as f:
+                f.write(f"{chunks} chunks, {wall_s:.2f} s wall\n\n")
+                f.write(torch_prof.key_averages().table(sort_by=sort_by, row_limit=40))
+                if req["record_shapes"]:
+                    f.write("\n\nBy input shape:\n")
+                    f.write(torch_prof.key_averages(group_by_input_shape=True).table(sort_by=sort_by, row_limit=25))
+
+            if py_prof is not None:
+                files["python_profile"] = os.path.join(self.out_dir, f"python_{stamp}.html")
+                with open(files["python_profile"], "w", encoding="utf-8") as f:
+                    f.write(py_prof.output_html())
+            self.status = {"state": "done", "chunks": chunks, "wall_s": wall_s, "files": files}
+            logger.info(f"Profiler capture written | chunks={chunks} | {files}")
+        except Exception as e:
+            logger.error("Writing profiler capture failed", exc_info=True)
+            self.status = {"state": "failed", "error": str(e)}
+
+PROFILER = PipelineProfiler(CFG.profile_dir)
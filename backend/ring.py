@@ -0,0 +1,143 @@
+import threading
+import time
+from collections import deque
+import torch
+
+OVERFLOW_POLICIES = ("block", "drop_oldest", "drop_newest")
+
+class ChunkRing:
+    """
+    Bounded ring of preallocated IQ chunk slots between the capture thread
+    (producer) and the inference thread (consumer).
+
+    When every slot is taken, put() applies the overflow policy:
+      block       - wait for the consumer to release a slot
+      drop_oldest - overwrite the oldest chunk not yet taken by the consumer
+      drop_newest - discard the incoming chunk
+    Slots hold complex64 samples; get() hands out views into the ring that
+    stay reserved until release() is called. Every chunk offered to put() is
+    numbered in meta["seq"], dropped ones included, so the consumer sees a
+    gap in the sequence where chunks were lost.
+    """
+    def __init__(self, capacity, iq_len, policy="drop_oldest"):
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unsupported overflow policy={policy}")
+        self.capacity = capacity
+        self.iq_len = iq_len
+        self.policy = policy
+
+        self.buf = torch.empty((capacity, iq_len), dtype=torch.complex64)
+        self.lengths = [0] * capacity
+        self.meta = [None] * capacity
+        self.t_put = [0.0] * capacity
+
+        self.free = deque(range(capacity))
+        self.filled = deque()
+        self.cond = threading.Condition()
+        self.closed = False
+
+        self.put_chunks = 0
+        self.put_samples = 0
+        self.got_chunks = 0
+        self.dropped_chunks = 0
+        self.dropped_samples = 0
+
+    def _drop(self, n_samples):
+        self.dropped_chunks += 1
+        self.dropped_samples += n_samples
+
+    def put(self, iq, meta, timeout=None):
+        """
+        Copies iq, complex (N,) or real (2, N) with N <= iq_len, into a free
+        slot; real input is interleaved straight into the complex slot.
+        returns True if the chunk was queued, False if it was dropped
+        """
+        n = iq.shape[-1]
+        with self.cond:
+            seq = self.put_chunks
+            self.put_chunks += 1
+            self.put_samples += n
+            if not self.free:
+                if self.policy == "block":
+                    self.cond.wait_for(lambda: self.free or self.closed, timeout)
+                elif self.policy == "drop_oldest" and self.filled:
+                    old = self.filled.popleft()
+                    self._drop(self.lengths[old])
+                    self.free.append(old)
+            if self.closed or not self.free:
+                self._drop(n)
+                return False
+            slot = self.free.popleft()
+
+        # slot is owned by the producer until it is appended to filled
+        if iq.is_complex():
+            self.buf[slot, :n].copy_(iq)
+        else:
+            torch.view_as_real(self.buf[slot, :n]).copy_(iq.T)
+
+        with self.cond:
+            self.lengths[slot] = n
+            meta["seq"] = seq
+            self.meta[slot] = meta
+            self.t_put[slot] = time.perf_counter()
+            self.filled.append(slot)
+            self.cond.notify_all()
+        return True
+
+    def get(self, timeout=None):
+        """
+        Takes the oldest queued chunk.
+        returns (iq_view, meta, t_put, slot) or None on timeout / close;
+        iq_view points into the ring and is valid until release(slot)
+        """
+        with self.cond:
+            self.cond.wait_for(lambda: self.filled or self.closed, timeout)
+            if not self.filled:
+                return None
+            slot = self.filled.popleft()
+            self.got_chunks += 1
+            return self.buf[slot, :self.lengths[slot]], self.meta[slot], self.t_put[slot], slot
+
+    def release(self, slots):
+        with self.cond:
+            for slot in slots:
+                self.meta[slot] = None
+                self.free.append(slot)
+            self.cond.notify_all()
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def depth(self):
+        return len(self.filled)
+
+    def drained(self):
+        return self.closed and not self.filled
+
+    def stats(self):
+        with self.cond:
+            return {
+                "capacity": self.capacity,
+                "policy": self.policy,
+                "depth": len(self.filled),
+                "put_chunks": self.put_chunks,
+                "got_chunks": self.got_chunks,
+                "dropped_chunks": self.dropped_chunks,
+                "dropped_samples": self.dropped_samples,
+                "coverage": 1.0 - self.dropped_samples / self.put_samples if self.put_samples else 1.0,
+            }
+
+class DutyCycle:
+    """Fraction of wall time a pipeline stage spends doing work."""
+    def __init__(self):
+        self.t0 = time.time()
+        self.busy_s = 0.0
+
+    def add(self, seconds):
+        self.busy_s += seconds
+
+    def value(self):
+        elapsed = time.time() - self.t0
+        return self.busy_s / elapsed if elapsed > 0 else 0.0
@@ -2,18 +2,36 @@
 import time
 import numpy as np
 import torch
-from pyhackrf import HackRF  # pip install pyhackrf
+
+import logging
+logger = logging.getLogger("drone_rf_backend")
 
 class HackRFSource:
-    def __init__(self, center_freq_hz, sample_rate_hz, gain_db, iq_len, sleep_s=0.05):
+    """
+    Emits complex64 IQ chunks of shape (N,) from a HackRF receiver.
+
+    Returned tensors share memory with the driver output or with one of
+    pool_size preallocated buffers, so a chunk must be consumed (e.g. copied
+    into the chunk ring) before pool_size further reads.
+
+    device: an already created HackRF-like object (e.g. SimulatedRadio from
+    sources/scanner.py); by default a pyhackrf HackRF is opened.
+    """
+    def __init__(self, center_freq_hz, sample_rate_hz, gain_db, iq_len, sleep_s=0.05, pool_size=2, device=None):
         self.center_freq_hz = center_freq_hz
         self.sample_rate_hz = sample_rate_hz
         self.gain_db = gain_db
         self.iq_len = iq_len
-        self.sleep_s = sleep_s
+        self.sleep_s = sleep_s     # pause after each read, taken by the app's producer loop
+
+        self.pool = [np.empty(iq_len, dtype=np.complex64) for _ in range(pool_size)]
+        self.pool_i = 0
 
         try:
-            self.hackrf = HackRF()
+            if device is None:
+                from pyhackrf import HackRF  # pip install pyhackrf
+                device = HackRF()
+            self.hackrf = device
             self.hackrf.sample_rate = self.sample_rate_hz
             self.hackrf.center_freq = self.center_freq_hz
             # Split gain roughly (LNA max 40, VGA max 62); adjust empirically
@@ -32,12 +50,31 @@ class HackRFSource:
             raise
         
 
+    def retune(self, center_freq_hz, settle_s=0.0):
+        """
+        Moves the receiver to center_freq_hz, then reads and discards settle_s
+        worth of samples while the synthesizer and AGC settle.
+        returns (retune_s, settle_s) wall times
+        """
+        t0 = time.perf_counter()
+        self.hackrf.center_freq = center_freq_hz
+        t1 = time.perf_counter()
+        self.center_freq_hz = center_freq_hz
+        n_settle = int(settle_s * self.sample_rate_hz)
+        if n_settle > 0:
+            self.hackrf.read_samples(n_settle)
+        return t1 - t0, time.perf_counter() - t1
+
     def read_iq_chunk(self):
         try:
-            samples_complex = self.hackrf.read_samples(self.iq_len)  # np.complex64, normalized [-1,1]
-            real = np.real(samples_complex).astype(np.float32)
-            imag = np.imag(samples_complex).astype(np.float32)
-            iq = torch.from_numpy(np.stack((real, imag), axis=0))  # (2, N)
+            samples_complex = self.hackrf.read_samples(self.iq_len)  # complex, normalized [-1,1]
+            if samples_complex.dtype == np.complex64:
+                buf = samples_complex                          # already the right layout, no copy
+            else:
+                buf = self.pool[self.pool_i]                   # single cast into a reused buffer
+                self.pool_i = (self.pool_i + 1) % len(self.pool)
+                np.copyto(buf, samples_complex, casting="same_kind")
+            iq = torch.from_numpy(buf)  # (N,) complex64 view
 
             meta = {
                 "source": "hackrf",
@@ -47,8 +84,7 @@ class HackRFSource:
                 "gain_db": self.gain_db,
                 "chunk_size": self.iq_len,
             }
-            time.sleep(self.sleep_s)
-            logger.debug(f"HackRF read OK | samples={self.iq_len:,}")
+            logger.debug("HackRF read OK | samples=%d", self.iq_len)
             return iq, meta
         except Exception as e:
             logger.warning(f"HackRF read error: {str(e)}")
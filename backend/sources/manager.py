@@ -0,0 +1,167 @@
+import threading
+import time
+
+from ring import ChunkRing, DutyCycle
+
+def build_source(spec, iq_len):
+    """Creates a source from a CFG.sources entry ({"id", "type", ...type-specific keys})."""
+    kind = spec["type"]
+    if kind == "pt":
+        from sources.pt_source import PtFileSource
+        return PtFileSource(spec["path"], loop=spec.get("loop", True), sleep_s=spec.get("sleep_s", 0.2),
+                            chunk_len=iq_len)
+    if kind == "shard":
+        from sources.shard_source import ShardFileSource
+        return ShardFileSource(spec["path"], loop=spec.get("loop", True), sleep_s=spec.get("sleep_s", 0.2),
+                               chunk_len=iq_len)
+    if kind == "hackrf":
+        from sources.hackrf_source import HackRFSource   # needs pyhackrf, only imported when used
+        return HackRFSource(spec["center_freq_hz"], spec["sample_rate_hz"], spec["gain_db"], iq_len,
+                            sleep_s=spec.get("sleep_s", 0.05))
+    if kind == "hackrf_scan":
+        from sources.scanner import HackRFScanner, ScanSchedule, SimulatedRadio
+        schedule = ScanSchedule(spec["bands"], revisit_window_s=spec.get("revisit_window_s", 10.0),
+                                hot_dwell_factor=spec.get("hot_dwell_factor", 3.0))
+        device = None
+        if spec.get("simulate"):
+            device = SimulatedRadio(emitters=spec.get("sim_emitters", ()))
+        return HackRFScanner(schedule, spec["sample_rate_hz"], spec["gain_db"], iq_len,
+                             settle_s=spec.get("settle_s", 0.002), sleep_s=spec.get("sleep_s", 0.0),
+                             device=device)
+    raise ValueError(f"Unknown source type={kind}")
+
+def build_sources(specs, iq_len):
+    """returns [(source_id, type, source)]; source ids must be unique"""
+    out = []
+    for spec in specs:
+        if spec["id"] in {source_id for source_id, _, _ in out}:
+            raise ValueError(f"Duplicate source id={spec['id']}")
+        out.append((spec["id"], spec["type"], build_source(spec, iq_len)))
+    return out
+
+class SourceChannel:
+    """One source with its own chunk ring, capture duty cycle and result counters."""
+    def __init__(self, source_id, kind, source, ring):
+        self.id = source_id
+        self.kind = kind
+        self.source = source
+        self.ring = ring
+        self.capture_duty = DutyCycle()
+        self.results = 0
+        self.detections = 0
+        self.latest = None
+
+    def record(self, result):
+        self.results += 1
+        if result["detected"]:
+            self.detections += 1
+            if hasattr(self.source, "on_detection"):
+                self.source.on_detection(result)     # e.g. the scanner dwells longer there
+        self.latest = result
+
+    def stats(self):
+        latest = self.latest
+        out = {
+            "type": self.kind,
+            "ring": self.ring.stats(),
+            "capture_duty_cycle": self.capture_duty.value(),
+            "results": self.results,
+            "detections": self.detections,
+            "latest": None if latest is None else {
+                "timestamp": latest["timestamp"],
+                "label": latest["label"],
+                "confidence": latest["confidence"],
+                "detected": latest["detected"],
+            },
+        }
+        if hasattr(self.source, "stats"):
+            out["source"] = self.source.stats()
+        return out
+
+class SourceManager:
+    """
+    Several IQ sources feeding one model.
+
+    Every source gets its own ChunkRing (and producer thread, started by the
+    app), so a stalled or bursty source only overflows its own ring. The
+    single consumer pulls with get(), which takes chunks round-robin across
+    the rings; plugged into BatchCollector, one forward pass can mix chunks
+    from different sources.
+    """
+    def __init__(self, channels):
+        self.channels = {ch.id: ch for ch in channels}
+        self._order = list(self.channels.values())
+        self._next = 0
+        self.ready = threading.Event()     # set after every put, wakes get()
+
+    @classmethod
+    def create(cls, sources, iq_len, ring_capacity, policy):
+        """sources: list of (source_id, type, source) from build_sources(); fresh rings per call"""
+        return cls([
+            SourceChannel(source_id, kind, source, ChunkRing(ring_capacity, iq_len, policy=policy))
+            for source_id, kind, source in sources
+        ])
+
+    def put(self, channel, iq, meta):
+        queued = channel.ring.put(iq, meta)
+        self.ready.set()
+        return queued
+
+    def get(self, timeout=None):
+        """
+        Next chunk from the rings, round-robin.
+        returns (iq_view, meta, t_put, slot, channel) or None on timeout;
+        release it with release()
+        """
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        n = len(self._order)
+        while True:
+            self.ready.clear()
+            for k in range(n):
+                ch = self._order[(self._next + k) % n]
+                item = ch.ring.get(timeout=0)
+                if item is not None:
+                    self._next = (self._next + k + 1) % n
+                    return (*item, ch)
+            if self.drained():
+                return None
+            remaining = None if deadline is None else deadline - time.perf_counter()
+            if remaining is not None and remaining <= 0:
+                return None
+            self.ready.wait(remaining)
+
+    def release(self, items):
+        for item in items:
+            item[4].ring.release([item[3]])
+
+    def close_channel(self, channel):
+        """A source ran out (or failed): close its ring, the others keep going."""
+        channel.ring.close()
+        self.ready.set()
+
+    def close(self):
+        for ch in self._order:
+            ch.ring.close()
+        self.ready.set()
+
+    @property
+    def closed(self):
+        return all(ch.ring.closed for ch in self._order)
+
+    def drained(self):
+        return all(ch.ring.drained() for ch in self._order)
+
+    def dropped_chunks(self):
+        return sum(ch.ring.dropped_chunks for ch in self._order)
+
+    def depth(self):
+        return sum(ch.ring.depth() for ch in self._order)
+
+    def coverage(self):
+        """Fraction of captured samples, over all sources, that reached inference."""
+        put = sum(ch.ring.put_samples for ch in self._order)
+        dropped = sum(ch.ring.dropped_samples for ch in self._order)
+        return 1.0 - dropped / put if put else 1.0
+
+    def stats(self):
+        return {ch.id: ch.stats() for ch in self._order}
@@ -2,14 +2,32 @@ import os
 import time
 import torch
 
+def split_recording(iq, meta, chunk_len):
+    """
+    (2, N) recording → [(iq, meta)] consecutive chunk_len pieces, each meta
+    with its sample "offset"; a trailing partial piece is dropped. The whole
+    recording as one chunk when chunk_len is None or not shorter than N.
+    """
+    if not chunk_len or chunk_len >= iq.shape[-1]:
+        return [(iq, meta)]
+    return [
+        (iq[:, k:k + chunk_len], dict(meta, offset=k))
+        for k in range(0, iq.shape[-1] - chunk_len + 1, chunk_len)
+    ]
+
 class PtFileSource:
     """
     Emits IQ chunks from .pt files (your dataset format) for backend testing.
+    With chunk_len shorter than a recording, each file is emitted as
+    consecutive chunk_len pieces (meta "offset"), like a receiver delivering
+    shorter chunks; a trailing partial piece is dropped.
     """
-    def __init__(self, pt_path_or_dir, loop=True, sleep_s=0.2):
+    def __init__(self, pt_path_or_dir, loop=True, sleep_s=0.2, chunk_len=None):
         self.path = pt_path_or_dir
         self.loop = loop
-        self.sleep_s = sleep_s
+        self.sleep_s = sleep_s     # pause after each read, taken by the app's producer loop
+        self.chunk_len = chunk_len
+        self.pending = []       # (iq, meta) pieces of the current file not emitted yet
 
         if os.path.isdir(self.path):
             self.files = [os.path.join(self.path, f) for f in os.listdir(self.path) if f.endswith(".pt")]
@@ -23,6 +41,8 @@ class PtFileSource:
         self.i = 0
 
     def read_iq_chunk(self):
+        if self.pending:
+            return self.pending.pop(0)
         if self.i >= len(self.files):
             if not self.loop:
                 return None
@@ -40,6 +60,5 @@ class PtFileSource:
             "snr": float(data.get("snr", -999)),
             "y": int(data.get("y", -1)),
         }
-
-        time.sleep(self.sleep_s)
-        return iq, meta
+        self.pending = split_recording(iq, meta, self.chunk_len)
+        return self.pending.pop(0)
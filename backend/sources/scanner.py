@@ -0,0 +1,206 @@
+# sources/scanner.py
+import threading
+import time
+import numpy as np
+
+from sources.hackrf_source import HackRFSource
+
+import logging
+logger = logging.getLogger("drone_rf_backend")
+
+class ScanSchedule:
+    """
+    Order and dwell of the bands a scanner visits.
+
+    Bands are visited round-robin, each for its dwell_s. A band with a
+    detection in the last revisit_window_s is "hot": it dwells
+    hot_dwell_factor times longer and is revisited after every other band,
+    so an active control link gets most of the radio time while the rest of
+    the spectrum is still swept.
+    """
+    def __init__(self, bands, revisit_window_s=10.0, hot_dwell_factor=3.0):
+        if not bands:
+            raise ValueError("Scan schedule needs at least one band")
+        self.bands = [
+            {
+                "name": b.get("name", f"{b['center_freq_hz'] / 1e6:.1f}MHz"),
+                "center_freq_hz": b["center_freq_hz"],
+                "dwell_s": b.get("dwell_s", 0.5),
+                "last_detection": None,
+                "visits": 0,
+                "detections": 0,
+            }
+            for b in bands
+        ]
+        self.revisit_window_s = revisit_window_s
+        self.hot_dwell_factor = hot_dwell_factor
+        self.lock = threading.Lock()
+        self._cold_i = 0
+        self._hot_i = 0
+        self._last_hot = False
+
+    def _is_hot(self, band, now):
+        return band["last_detection"] is not None and now - band["last_detection"] < self.revisit_window_s
+
+    def next(self, now=None):
+        """returns (band, dwell_s) for the next visit"""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            hot = [b for b in self.bands if self._is_hot(b, now)]
+            if hot and (not self._last_hot or len(hot) == len(self.bands)):
+                band = hot[self._hot_i % len(hot)]
+                self._hot_i += 1
+                self._last_hot = True
+            else:
+                # sweep position over the cold bands (hot ones get their own turns)
+                while True:
+                    band = self.bands[self._cold_i % len(self.bands)]
+                    self._cold_i += 1
+                    if band not in hot:
+                        break
+                self._last_hot = False
+            band["visits"] += 1
+            dwell = band["dwell_s"] * (self.hot_dwell_factor if self._is_hot(band, now) else 1.0)
+        return band, dwell
+
+    def report_detection(self, center_freq_hz, now=None):
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            for band in self.bands:
+                if band["center_freq_hz"] == center_freq_hz:
+                    band["last_detection"] = now
+                    band["detections"] += 1
+
+    def stats(self, now=None):
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            return {
+                b["name"]: {
+                    "center_freq_hz": b["center_freq_hz"],
+                    "visits": b["visits"],
+                    "detections": b["detections"],
+                    "hot": self._is_hot(b, now),
+                }
+                for b in self.bands
+            }
+
+class HackRFScanner(HackRFSource):
+    """
+    HackRFSource that sweeps a ScanSchedule instead of staying on one frequency.
+
+    Chunks are read on a band until its dwell time is used up (at least one
+    chunk per visit), then the radio is retuned and settle_s of samples is
+    discarded. Each chunk's meta carries its band and frequency; retune and
+    settle times are reported on the first chunk of a visit and summarised
+    in stats(). Detections fed back through on_detection() make a band hot.
+    """
+    def __init__(self, schedule, sample_rate_hz, gain_db, iq_len, settle_s=0.002, sleep_s=0.0,
+                 pool_size=2, device=None):
+        self.schedule = schedule
+        self.settle_s = settle_s
+        super().__init__(schedule.bands[0]["center_freq_hz"], sample_rate_hz, gain_db, iq_len,
+                         sleep_s=sleep_s, pool_size=pool_size, device=device)
+        self.band = None
+        self.dwell_end = 0.0
+        self.visit = 0
+        self.retunes = 0
+        self.retune_s_total = 0.0
+        self.retune_s_max = 0.0
+        self.settle_s_total = 0.0
+        self.sweep_t0 = time.monotonic()
+
+    def _next_visit(self):
+        band, dwell_s = self.schedule.next()
+        retune_s = settle_s = 0.0
+        if band["center_freq_hz"] != self.center_freq_hz:
+            retune_s, settle_s = self.retune(band["center_freq_hz"], self.settle_s)
+            self.retunes += 1
+            self.retune_s_total += retune_s
+            self.retune_s_max = max(self.retune_s_max, retune_s)
+            self.settle_s_total += settle_s
+        self.band = band
+        self.visit += 1
+        self.dwell_end = time.monotonic() + dwell_s
+        return retune_s, settle_s
+
+    def read_iq_chunk(self):
+        first = self.band is None or time.monotonic() >= self.dwell_end
+        if first:
+            try:
+                retune_s, settle_s = self._next_visit()
+            except Exception as e:
+                logger.warning(f"HackRF retune error: {str(e)}")
+                return None, None
+
+        iq, meta = super().read_iq_chunk()
+        if iq is None:
+            return iq, meta
+        meta["source"] = "hackrf_scan"
+        meta["band"] = self.band["name"]
+        meta["visit"] = self.visit
+        if first:
+            meta["retune_ms"] = retune_s * 1000.0
+            meta["settle_ms"] = settle_s * 1000.0
+        return iq, meta
+
+    def on_detection(self, result):
+        freq = result.get("meta", {}).get("freq_hz")
+        if freq is not None:
+            self.schedule.report_detection(freq)
+
+    def stats(self):
+        elapsed = time.monotonic() - self.sweep_t0
+        return {
+            "band": self.band["name"] if self.band else None,
+            "retunes": self.retunes,
+            "retune_ms_mean": self.retune_s_total / self.retunes * 1000.0 if self.retunes else None,
+            "retune_ms_max": self.retune_s_max * 1000.0,
+            "settle_ms_mean": self.settle_s_total / self.retunes * 1000.0 if self.retunes else None,
+            # share of wall time lost to retuning + settling (radio not delivering chunks)
+            "retune_overhead": (self.retune_s_total + self.settle_s_total) / elapsed if elapsed > 0 else 0.0,
+            "bands": self.schedule.stats(),
+        }
+
+class SimulatedRadio:
+    """
+    Stand-in for pyhackrf.HackRF to exercise the scanner without hardware.
+
+    Returns complex Gaussian noise, plus a tone while tuned to one of the
+    `emitters` frequencies. Retuning sleeps retune_s; reads are paced at the
+    sample rate like a real receiver.
+    """
+    def __init__(self, emitters=(), retune_s=0.001, noise=0.05, tone=0.5, seed=0):
+        self.emitters = set(emitters)
+        self.retune_s = retune_s
+        self.noise = noise
+        self.tone = tone
+        self.rng = np.random.default_rng(seed)
+        self.sample_rate = 20e6
+        self._center_freq = 0
+        self.lna_gain = 0
+        self.vga_gain = 0
+        self.rx = False
+
+    @property
+    def center_freq(self):
+        return self._center_freq
+
+    @center_freq.setter
+    def center_freq(self, hz):
+        time.sleep(self.retune_s)
+        self._center_freq = hz
+
+    def enable_rx(self):
+        self.rx = True
+
+    def disable_rx(self):
+        self.rx = False
+
+    def read_samples(self, n):
+        t0 = time.perf_counter()
+        x = self.rng.standard_normal((n, 2), dtype=np.float32) * self.noise
+        out = x.view(np.complex64)[:, 0]
+        if self._center_freq in self.emitters:
+            out += self.tone * np.exp(1j * 2 * np.pi * 0.05 * np.arange(n, dtype=np.float32)).astype(np.complex64)
+        time.sleep(max(0.0, n / self.sample_rate - (time.perf_counter() - t0)))
+        return out
@@ -0,0 +1,52 @@
+import os
+import sys
+import time
+import torch
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "/home/ghoth/thesis_drone_detection/Robust-Drone-Detection-and-Classification/"))
+sys.path.append(PROJECT_ROOT)
+
+from lib.iq_shards import IQShardReader
+from sources.pt_source import split_recording
+
+class ShardFileSource:
+    """
+    Emits IQ chunks from memory-mapped dataset shards (see convert_to_shards.py).
+    Same chunks and meta as PtFileSource (including chunk_len pieces), without
+    a torch.load per chunk.
+    """
+    def __init__(self, shard_dir, loop=True, sleep_s=0.2, chunk_len=None):
+        self.path = shard_dir
+        self.loop = loop
+        self.sleep_s = sleep_s     # pause after each read, taken by the app's producer loop
+        self.chunk_len = chunk_len
+        self.pending = []
+        self.reader = IQShardReader(shard_dir)
+
+        if len(self.reader) == 0:
+            raise FileNotFoundError(f"No records found in {self.path}")
+
+        self.i = 0
+
+    def read_iq_chunk(self):
+        if self.pending:
+            return self.pending.pop(0)
+        if self.i >= len(self.reader):
+            if not self.loop:
+                return None
+            self.i = 0
+
+        idx = self.i
+        self.i += 1
+
+        iq = torch.from_numpy(self.reader.read(idx))    # (2, 1048576) view of the mapped shard
+        index = self.reader.index
+        meta = {
+            "source": "shard",
+            "file": index["files"][idx],
+            "ts": time.time(),
+            "snr": float(index["snr"][idx]),
+            "y": int(index["y"][idx]),
+        }
+        self.pending = split_recording(iq, meta, self.chunk_len)
+        return self.pending.pop(0)
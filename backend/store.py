@@ -1,22 +1,215 @@
-from collections import deque
+import asyncio
+import atexit
+import itertools
+import json
+import os
+import queue
+import sqlite3
+import threading
 import time
+from dataclasses import dataclass
+
+from config import CFG
+
+class SqliteEventStore:
+    """
+    Append-only detection history in SQLite (WAL: readers never block the writer).
+    add() only enqueues; a writer thread inserts whatever has piled up in one
+    transaction every `flush_s`. Ids are handed out by add(), so an event can
+    be pushed with its id before it is written. Rows are indexed by id, time
+    and label.
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS events (
+            id          INTEGER PRIMARY KEY AUTOINCREMENT,
+            ts          REAL NOT NULL,
+            label       TEXT NOT NULL,
+            pred        INTEGER NOT NULL,
+            confidence  REAL NOT NULL,
+            source      TEXT,                  -- meta source_id (CFG.sources)
+            data        TEXT NOT NULL          -- full result dict as JSON
+        );
+        CREATE INDEX IF NOT EXISTS events_ts ON events (ts);
+        CREATE INDEX IF NOT EXISTS events_label ON events (label, id);
+    """
+    INDEXES = """
+        CREATE INDEX IF NOT EXISTS events_source ON events (source, id);
+    """
+
+    def __init__(self, path, flush_s=0.5, max_batch=256):
+        self.path = path
+        self.flush_s = flush_s
+        self.max_batch = max_batch
+        self._pending = queue.SimpleQueue()
+        self._local = threading.local()      # one read connection per request thread
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        db = self._connect()
+        db.execute("PRAGMA journal_mode=WAL")
+        db.executescript(self.SCHEMA)
+        columns = {row[1] for row in db.execute("PRAGMA table_info(events)")}
+        if "source" not in columns:      # database from before multi-source
+            db.execute("ALTER TABLE events ADD COLUMN source TEXT")
+        db.executescript(self.INDEXES)
+        last_id = db.execute("SELECT MAX(id) FROM events").fetchone()[0] or 0
+        db.close()
+        self._ids = itertools.count(last_id + 1)
+
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=5.0)
+        db.execute("PRAGMA synchronous=NORMAL")   # WAL + NORMAL: durable across app crashes, cheap commits
+        return db
+
+    def _reader(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = self._local.db = self._connect()
+        return db
+
+    def add(self, evt):
+        """returns the event's id"""
+        event_id = next(self._ids)
+        self._pending.put((event_id, evt))
+        return event_id
+
+    def _write_loop(self):
+        db = self._connect()
+        while True:
+            evt = self._pending.get()
+            batch = [evt]
+            if evt is not None:
+                time.sleep(self.flush_s)         # let the batch fill up
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._pending.get_nowait())
+                except queue.Empty:
+                    break
+            done = None in batch
+            rows = [
+                (event_id, e.get("timestamp", time.time()), e["label"], e["pred"], e["confidence"],
+                 e.get("meta", {}).get("source_id"), json.dumps(e, default=str))
+                for event_id, e in (item for item in batch if item is not None)
+            ]
+            if rows:
+                with db:
+                    db.executemany(
+                        "INSERT INTO events (id, ts, label, pred, confidence, source, data) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        rows,
+                    )
+            if done:
+                db.close()
+                return
+
+    def close(self):
+        """Flushes pending events and stops the writer."""
+        self._pending.put(None)
+        self._writer.join()
+
+    def query(self, limit=50, since=None, before=None, label=None, source=None, t_from=None, t_to=None):
+        """
+        since:  rows with id > since, oldest first (poll for new events)
+        before: rows with id < before, newest first (page back through history)
+        neither: the newest `limit` rows, newest first
+        label / source / t_from / t_to narrow either mode.
+        """
+        where, args = [], []
+        if since is not None:
+            where.append("id > ?")
+            args.append(since)
+        if before is not None:
+            where.append("id < ?")
+            args.append(before)
+        if label is not None:
+            where.append("label = ?")
+            args.append(label)
+        if source is not None:
+            where.append("source = ?")
+            args.append(source)
+        if t_from is not None:
+            where.append("ts >= ?")
+            args.append(t_from)
+        if t_to is not None:
+            where.append("ts < ?")
+            args.append(t_to)
+        sql = "SELECT id, data FROM events"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY id " + ("ASC" if since is not None else "DESC") + " LIMIT ?"
+        args.append(limit)
+
+        events = []
+        for row_id, data in self._reader().execute(sql, args):
+            evt = json.loads(data)
+            evt["id"] = row_id
+            events.append(evt)
+        return events
+
+@dataclass(frozen=True)
+class LatestSnapshot:
+    """One published `latest` result, serialized once. `data` is never mutated after publishing."""
+    version: int
+    data: dict | None
+    body: bytes          # JSON served as-is by /latest (and reused by /stream)
+    etag: str
+
+def _wake(fut):
+    if not fut.done():
+        fut.set_result(None)
 
 class InMemoryStore:
-    def __init__(self, max_events=500):
-        self.latest = None
-        self.events = deque(maxlen=max_events)
+    def __init__(self, event_store):
+        self.events = event_store
         self.running = False
+        self._boot = f"{int(time.time()):x}"    # ETags from a previous run never match
+        self._lock = threading.Lock()
+        self._waiters = []                      # (loop, future) of parked /latest?wait= requests
+        self.snapshot = self._snapshot(0, None)
+
+    def _snapshot(self, version, obj):
+        body = json.dumps(obj if obj is not None else {"status": "no data yet"}, default=str)
+        return LatestSnapshot(version, obj, body.encode(), f'"{self._boot}-{version}"')
 
     def set_latest(self, obj):
-        self.latest = obj
+        snap = self._snapshot(self.snapshot.version + 1, obj)   # only the inference thread publishes
+        with self._lock:
+            self.snapshot = snap
+            waiters, self._waiters = self._waiters, []
+        for loop, fut in waiters:
+            try:
+                loop.call_soon_threadsafe(_wake, fut)
+            except RuntimeError:
+                pass    # that request's loop is gone
+        return snap
+
+    async def wait_latest(self, version, timeout):
+        """Returns the first snapshot newer than `version`, or the current one after `timeout` s."""
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        with self._lock:
+            if self.snapshot.version != version:
+                return self.snapshot
+            self._waiters.append((loop, fut))
+        try:
+            await asyncio.wait_for(fut, timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                if (loop, fut) in self._waiters:
+                    self._waiters.remove((loop, fut))
+        return self.snapshot
 
     def add_event(self, evt):
-        self.events.appendleft(evt)
+        """returns the event's id"""
+        return self.events.add(evt)
 
     def get_latest(self):
-        return self.latest
+        return self.snapshot.data
 
-    def get_events(self, limit=50):
-        return list(self.events)[:limit]
+    def get_events(self, limit=50, **filters):
+        return self.events.query(limit=limit, **filters)
 
-STORE = InMemoryStore()
+STORE = InMemoryStore(SqliteEventStore(CFG.event_db_path, flush_s=CFG.event_flush_s))
+atexit.register(STORE.events.close)     # flush the last batch on shutdown
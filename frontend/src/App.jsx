@@ -7,6 +7,7 @@ import React, { useEffect, useMemo, useRef, useState } from "react";
  *   POST  http://localhost:8000/stop
  *   GET   http://localhost:8000/latest
  *   GET   http://localhost:8000/events?limit=20
+ *   GET   http://localhost:8000/stream        (SSE: "result" / "detection")
  *   POST  http://localhost:8000/settings   { threshold }
  */
 
@@ -26,12 +27,15 @@ export default function App() {
   const [thresholdDraft, setThresholdDraft] = useState(0.5);
   const [thresholdServer, setThresholdServer] = useState(null);
 
-  const [pollMs, setPollMs] = useState(800);
+  const [streamState, setStreamState] = useState("connecting");
 
   const [statusMsg, setStatusMsg] = useState("");
   const [errorMsg, setErrorMsg] = useState("");
 
-  const timerRef = useRef(null);
+  const limitRef = useRef(limit);
+  limitRef.current = limit;
+  const eventsRef = useRef(events);
+  eventsRef.current = events;
 
   async function api(path, opts = {}) {
     const url = `${API_BASE}${path}`;
@@ -50,14 +54,17 @@ export default function App() {
     return data;
   }
 
+  function applyLatest(data) {
+    setLatest(data);
+    if (data && typeof data.threshold === "number") {
+      setThresholdServer(Number(data.threshold));
+      setThresholdDraft((prev) => (thresholdServer == null ? Number(data.threshold) : prev));
+    }
+  }
+
   async function refreshLatest() {
     try {
-      const data = await api("/latest");
-      setLatest(data);
-      if (data && typeof data.threshold === "number") {
-        setThresholdServer(Number(data.threshold));
-        setThresholdDraft((prev) => (thresholdServer == null ? Number(data.threshold) : prev));
-      }
+      applyLatest(await api("/latest"));
       setErrorMsg("");
     } catch (e) {
       setErrorMsg(String(e.message || e));
@@ -66,7 +73,7 @@ export default function App() {
 
   async function refreshEvents() {
     try {
-      const data = await api(`/events?limit=${encodeURIComponent(limit)}`);
+      const data = await api(`/events?limit=${encodeURIComponent(limitRef.current)}`);
       setEvents(Array.isArray(data) ? data : data?.events || []);
       setErrorMsg("");
     } catch (e) {
@@ -74,6 +81,29 @@ export default function App() {
     }
   }
 
+  // Detections published while the stream was down: fetch the ones newer than the table
+  async function catchUpEvents() {
+    try {
+      const maxId = Math.max(0, ...eventsRef.current.map((ev) => ev.id ?? 0));
+      const lim = limitRef.current;
+      const data = await api(`/events?since=${maxId}&limit=${encodeURIComponent(lim)}`);
+      const rows = Array.isArray(data) ? data : data?.events || []; // oldest first
+      if (rows.length >= lim) {
+        await refreshEvents(); // missed a whole page or more: reload the newest
+        return;
+      }
+      rows.forEach(addEvent); // oldest first, each goes on top
+    } catch (e) {
+      setErrorMsg(String(e.message || e));
+    }
+  }
+
+  function addEvent(ev) {
+    setEvents((prev) =>
+      prev.some((p) => p.id === ev.id) ? prev : [ev, ...prev].slice(0, limitRef.current)
+    );
+  }
+
   async function startWorker() {
     try {
       const data = await api("/start", { method: "POST" });
@@ -113,20 +143,32 @@ export default function App() {
     }
   }
 
-  // Polling
+  // Events history: fetched once per limit change, then kept current by the stream
+  // (and caught up after a reconnect)
   useEffect(() => {
-    async function tick() {
-      await refreshLatest();
-      await refreshEvents();
-    }
-    tick();
-
-    if (timerRef.current) clearInterval(timerRef.current);
-    timerRef.current = setInterval(tick, Math.max(250, Number(pollMs) || 800));
+    refreshEvents();
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [limit]);
 
-    return () => timerRef.current && clearInterval(timerRef.current);
+  // Live push (SSE) - the server sends the current latest on connect, then every new result
+  useEffect(() => {
+    const es = new EventSource(`${API_BASE}/stream`);
+    let reconnect = false;
+    es.onopen = () => {
+      setStreamState("live");
+      if (reconnect) catchUpEvents();
+      reconnect = true;
+    };
+    es.onerror = () => setStreamState("reconnecting"); // EventSource retries on its own
+    es.addEventListener("result", (e) => {
+      applyLatest(JSON.parse(e.data));
+    });
+    es.addEventListener("detection", (e) => {
+      addEvent(JSON.parse(e.data)); // carries its event id, like the /events rows
+    });
+    return () => es.close();
     // eslint-disable-next-line react-hooks/exhaustive-deps
-  }, [pollMs, limit]);
+  }, []);
 
   const latestView = useMemo(() => {
     if (!latest) return { empty: true, msg: "No data yet" };
@@ -137,6 +179,8 @@ export default function App() {
       pred: latest.pred ?? "-",
       confidence: typeof latest.confidence === "number" ? latest.confidence : null,
       detected: Boolean(latest.detected),
+      provisional: Boolean(latest.provisional), // progressive mode: classified on part of the chunk
+      fraction: typeof latest.fraction === "number" ? latest.fraction : null,
       latency: latest.latency_ms ?? null,
       ts: latest.timestamp ?? null,
       spec: Array.isArray(latest.spec_shape) ? latest.spec_shape.join(" × ") : "-",
@@ -175,7 +219,7 @@ export default function App() {
         <div>
           <div style={{ fontSize: 20, fontWeight: 900 }}>Drone RF Dashboard</div>
           <div style={{ color: "#64748b", fontSize: 12 }}>
-            Backend: <code>{API_BASE}</code>
+            Backend: <code>{API_BASE}</code> · stream: <b>{streamState}</b>
           </div>
         </div>
         <div style={{ display: "flex", gap: 10 }}>
@@ -219,6 +263,11 @@ export default function App() {
                   >
                     {latestView.detected ? "DETECTED" : "NOISE"}
                   </span>
+                  {latestView.provisional && (
+                    <span style={{ marginLeft: 6, fontSize: 12, fontWeight: 700, color: "#b45309" }}>
+                      provisional ({Math.round(latestView.fraction * 100)}%)
+                    </span>
+                  )}
                 </div>
 
                 <div style={{ marginTop: 10, display: "flex", gap: 10, flexWrap: "wrap" }}>
@@ -290,23 +339,6 @@ export default function App() {
             </div>
 
             <div style={{ marginTop: 12, display: "grid", gridTemplateColumns: "1fr 1fr", gap: 10 }}>
-              <div>
-                <div style={{ color: "#64748b", fontSize: 12 }}>Poll interval (ms)</div>
-                <input
-                  type="number"
-                  min="250"
-                  step="50"
-                  value={pollMs}
-                  onChange={(e) => setPollMs(e.target.value)}
-                  style={{
-                    marginTop: 6,
-                    width: "100%",
-                    padding: "8px 10px",
-                    borderRadius: 10,
-                    border: "1px solid #cbd5e1",
-                  }}
-                />
-              </div>
               <div>
                 <div style={{ color: "#64748b", fontSize: 12 }}>Events limit</div>
                 <input
@@ -354,11 +386,14 @@ export default function App() {
                   </tr>
                 ) : (
                   events.map((ev, idx) => (
-                    <tr key={idx} style={{ background: idx % 2 ? "#fff" : "#fbfdff" }}>
+                    <tr key={ev.id ?? idx} style={{ background: idx % 2 ? "#fff" : "#fbfdff" }}>
                       <td style={{ padding: 10, borderBottom: "1px solid #f1f5f9", whiteSpace: "nowrap" }}>
                         {fmtTs(ev.timestamp)}
                       </td>
-                      <td style={{ padding: 10, borderBottom: "1px solid #f1f5f9" }}>{ev.label ?? "-"}</td>
+                      <td style={{ padding: 10, borderBottom: "1px solid #f1f5f9" }}>
+                        {ev.label ?? "-"}
+                        {ev.provisional && <span style={{ marginLeft: 6, fontSize: 11, color: "#b45309" }}>provisional</span>}
+                      </td>
                       <td style={{ padding: 10, borderBottom: "1px solid #f1f5f9" }}>
                         {typeof ev.confidence === "number" ? ev.confidence.toFixed(3) : "-"}
                       </td>